@@ -0,0 +1,237 @@
+"""
+Headless rendering benchmark for the Pokemon Todo List
+Runs TodoApp under SDL's dummy video driver against synthetic datasets
+and reports per-frame latency percentiles and allocations per view.
+
+    python benchmark.py --sizes 10,1000,100000 --backend sqlite
+"""
+import os
+
+# Must be set before pygame initializes its video subsystem
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import main
+from storage import MongoStorage, SQLiteStorage
+
+SHORT_NAME = 'Task {i}'
+LONG_NAME = 'Task {i} ' + 'with a very long description that never fits ' * 5
+SMALL_CATEGORIES = 19  # Besides the big category holding most tasks
+BATCH_SIZE = 10000
+
+
+def open_backend(backend, tmp_dir):
+    """A fresh, empty storage backend that needs no server"""
+    if backend == 'sqlite':
+        return SQLiteStorage(os.path.join(tmp_dir, 'bench.db'))
+    if backend == 'mongomock':
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit('mongomock is not installed: pip install mongomock')
+        import storage
+        storage.MongoClient = mongomock.MongoClient
+        return MongoStorage(db_name='todo_benchmark')
+    sys.exit(f'Unknown backend: {backend}')
+
+
+def seed(storage, task_count, long_names):
+    """Fill storage with one big category and a few small ones
+
+    Returns the _id of the big category.
+    """
+    template = LONG_NAME if long_names else SHORT_NAME
+    base = datetime(2024, 1, 1)
+    categories = [{
+        '_id': ObjectId(),
+        'name': template.format(i=f'goal {i}'),
+        'created_at': base + timedelta(minutes=i),
+    } for i in range(SMALL_CATEGORIES + 1)]
+    storage.insert_categories(categories)
+
+    big_id = categories[0]['_id']
+    batch = []
+    for i in range(task_count):
+        # Every tenth task goes to a small category
+        category = categories[1 + i % SMALL_CATEGORIES] if i % 10 == 9 \
+            else categories[0]
+        batch.append({
+            '_id': ObjectId(),
+            'category_id': category['_id'],
+            'name': template.format(i=i),
+            'completed': i % 3 == 0,
+            'created_at': base + timedelta(seconds=i),
+        })
+        if len(batch) == BATCH_SIZE:
+            storage.insert_tasks(batch)
+            batch = []
+    storage.insert_tasks(batch)
+    storage.ensure_indexes()
+    return big_id
+
+
+def settle(app, timeout=30):
+    """Run draw passes until no storage work, page loads or search
+    index build are pending"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        app.draw_frame()
+        time.sleep(0.01)
+        processed = app.process_storage_results()
+        if (not processed and app.storage_worker.commands.empty()
+                and not app.tasks.pending and not app.loading
+                and app.search_log is None):
+            return
+    print('⚠ Timed out waiting for storage work', file=sys.stderr)
+
+
+def setup_views(app, big_id):
+    """(view name, function that puts the app into that view)"""
+    def categories():
+        app.current_view = 'categories'
+        app.confirming_action = app.editing_item = app.viewing_task = None
+
+    def tasks(position=0.0):
+        def enter():
+            categories()
+            app.current_view = 'tasks'
+            app.selected_category_id = big_id
+            app.selected_category_name = app.categories.get(big_id)['name']
+            total = app.get_task_counts(big_id)[0]
+            app.task_scroll = max(0, min(int(total * position),
+                                         total - app.items_per_page))
+            app.load_tasks(big_id)
+        return enter
+
+    def confirm():
+        tasks()()
+        task = app.tasks.at(0) or {'_id': None, 'name': ''}
+        app.confirming_action = {
+            'action': 'delete_task',
+            'data': {'id': task['_id'], 'name': task['name']}}
+
+    def edit():
+        tasks()()
+        task = app.tasks.at(0) or {'_id': None, 'name': ''}
+        app.editing_item = {'type': 'task', 'id': task['_id'],
+                            'name': task['name']}
+        app.edit_input.text = task['name']
+        app.edit_input.cursor_position = len(task['name'])
+
+    def view():
+        tasks()()
+        app.viewing_task = app.tasks.at(0) or {'name': ''}
+
+    return [
+        ('categories', categories),
+        ('tasks (top)', tasks(0)),
+        ('tasks (middle)', tasks(0.5)),
+        ('confirm dialog', confirm),
+        ('edit dialog', edit),
+        ('view dialog', view),
+    ]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(app, frames):
+    """Time full frames, then measure allocations in a second pass"""
+    timings = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        app.draw_frame()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    misses_before = main.text_cache.misses
+    tracemalloc.start()
+    peaks = []
+    for _ in range(frames):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        app.draw_frame()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': statistics.median(timings),
+        'p95_ms': percentile(timings, 0.95),
+        'p99_ms': percentile(timings, 0.99),
+        'max_ms': max(timings),
+        'alloc_kb_per_frame': statistics.mean(peaks) / 1024,
+        'text_surfaces_per_frame':
+            (main.text_cache.misses - misses_before) / frames,
+    }
+
+
+def run_dataset(backend, task_count, long_names, frames):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = open_backend(backend, tmp_dir)
+        seed_start = time.perf_counter()
+        big_id = seed(storage, task_count, long_names)
+        seed_ms = (time.perf_counter() - seed_start) * 1000
+
+        main.text_cache.clear()
+        app = main.TodoApp(storage=storage, sync=False, journal_path=None)
+        settle(app)
+        results = []
+        for view, enter in setup_views(app, big_id):
+            enter()
+            settle(app)
+            results.append((view, measure(app, frames)))
+        app.storage_worker.stop()
+        storage.close()
+        return seed_ms, results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='10,1000,100000',
+                        help='comma separated task counts (up to 1000000)')
+    parser.add_argument('--backend', default='sqlite',
+                        choices=['sqlite', 'mongomock'])
+    parser.add_argument('--frames', type=int, default=120,
+                        help='frames measured per view')
+    parser.add_argument('--names', default='short,long',
+                        help='name lengths to test: short, long or both')
+    parser.add_argument('--output', help='also write results as JSON')
+    args = parser.parse_args()
+
+    report = []
+    header = (f"{'tasks':>8} {'names':>5} {'view':<15} {'p50':>7} "
+              f"{'p95':>7} {'p99':>7} {'max':>7} {'KB/fr':>7} {'txt/fr':>6}")
+    print(header)
+    print('-' * len(header))
+    for size in (int(size) for size in args.sizes.split(',')):
+        for names in args.names.split(','):
+            seed_ms, results = run_dataset(
+                args.backend, size, names == 'long', args.frames)
+            for view, stats in results:
+                print(f"{size:>8} {names:>5} {view:<15} "
+                      f"{stats['p50_ms']:>7.2f} {stats['p95_ms']:>7.2f} "
+                      f"{stats['p99_ms']:>7.2f} {stats['max_ms']:>7.2f} "
+                      f"{stats['alloc_kb_per_frame']:>7.1f} "
+                      f"{stats['text_surfaces_per_frame']:>6.2f}")
+                report.append(dict(stats, tasks=size, names=names, view=view,
+                                   backend=args.backend, seed_ms=seed_ms))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -1,10 +1,16 @@
 """
 Create pixelated Pokemon-style character sprites
+Saves each sprite to sprites/ and packs them all into sprites/atlas.png,
+with the rect of every sprite in sprites/atlas.json. The app loads the
+atlas and draws sprites with these functions when it is missing.
 """
-import pygame
+import json
 import os
 
-pygame.init()
+import pygame
+
+ATLAS_WIDTH = 128
+ATLAS_PADDING = 1  # Transparent gap between sprites
 
 def create_pikachu_sprite():
     """Create a simple Pikachu sprite"""
@@ -160,31 +166,66 @@ def create_checked_sprite():
     
     return sprite
 
-# Create sprites directory
-if not os.path.exists('sprites'):
-    os.makedirs('sprites')
+SPRITES = {
+    'pikachu': create_pikachu_sprite,
+    'pokeball': create_pokeball_sprite,
+    'badge': create_badge_sprite,
+    'checkbox': create_checkbox_sprite,
+    'checked': create_checked_sprite,
+}
+
+
+def pack_atlas(sprites, width=ATLAS_WIDTH):
+    """Pack named surfaces into one image
+
+    Shelf packing, tallest sprites first. Returns the atlas surface and
+    {name: [x, y, width, height]}.
+    """
+    index = {}
+    x = y = shelf_height = 0
+    order = sorted(sprites, key=lambda name: -sprites[name].get_height())
+    for name in order:
+        w, h = sprites[name].get_size()
+        if x and x + w > width:
+            x, y = 0, y + shelf_height + ATLAS_PADDING
+            shelf_height = 0
+        index[name] = [x, y, w, h]
+        x += w + ATLAS_PADDING
+        shelf_height = max(shelf_height, h)
+
+    atlas = pygame.Surface(
+        (max(width, *(w for _, _, w, _ in index.values())),
+         y + shelf_height), pygame.SRCALPHA)
+    for name, (x, y, _, _) in index.items():
+        atlas.blit(sprites[name], (x, y))
+    return atlas, index
+
+
+def main():
+    pygame.init()
 
-# Save sprites
-pikachu = create_pikachu_sprite()
-pygame.image.save(pikachu, 'sprites/pikachu.png')
+    # Create sprites directory
+    if not os.path.exists('sprites'):
+        os.makedirs('sprites')
 
-pokeball = create_pokeball_sprite()
-pygame.image.save(pokeball, 'sprites/pokeball.png')
+    # Save sprites
+    sprites = {name: create() for name, create in SPRITES.items()}
+    for name, sprite in sprites.items():
+        pygame.image.save(sprite, f'sprites/{name}.png')
 
-badge = create_badge_sprite()
-pygame.image.save(badge, 'sprites/badge.png')
+    atlas, index = pack_atlas(sprites)
+    pygame.image.save(atlas, 'sprites/atlas.png')
+    with open('sprites/atlas.json', 'w') as f:
+        json.dump(index, f, indent=2)
 
-checkbox = create_checkbox_sprite()
-pygame.image.save(checkbox, 'sprites/checkbox.png')
+    print("✓ Created Pokemon sprites!")
+    for name in sprites:
+        print(f"  - {name}.png")
+    print(f"  - atlas.png ({atlas.get_width()}x{atlas.get_height()}, "
+          f"index in atlas.json)")
 
-checked = create_checked_sprite()
-pygame.image.save(checked, 'sprites/checked.png')
+    pygame.quit()
 
-print("✓ Created Pokemon sprites!")
-print("  - pikachu.png")
-print("  - pokeball.png")
-print("  - badge.png")
-print("  - checkbox.png")
-print("  - checked.png")
 
-pygame.quit()
+if __name__ == '__main__':
+    main()
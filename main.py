@@ -2,12 +2,29 @@
 Pokemon-Style Todo List Application
 A pixelated task manager with categories and tasks
 """
+import time
+STARTUP_T0 = time.perf_counter()
+
 import pygame
 import sys
+import argparse
 import os
 import math
-from pymongo import MongoClient
+import bisect
+import queue
+import threading
+import json
+import re
+import heapq
+from array import array
+from collections import OrderedDict, deque
+from bson import ObjectId
 from datetime import datetime
+from storage import open_storage, check_indexes, WriteRejected
+from transfer import export_jsonl, import_jsonl
+from replica import open_replica
+from writebehind import WriteBehind, DEFAULT_JOURNAL_PATH
+from create_sprites import SPRITES, pack_atlas
 
 try:
     import pyperclip
@@ -16,13 +33,24 @@ except ImportError:
     CLIPBOARD_AVAILABLE = False
     print("Warning: pyperclip not installed, clipboard functionality disabled")
 
-# Initialize Pygame
-pygame.init()
-
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 FPS = 60
+# Only redraw dirty regions and sleep in pygame.event.wait when idle
+REDRAW_ONLY_WHEN_DIRTY = True
+IDLE_TIMEOUT_MS = 1000  # Longest idle wait before re-checking state
+CURSOR_BLINK_MS = 500
+STORAGE_EVENT = pygame.USEREVENT + 1  # Posted when storage work finishes
+PROFILER_REFRESH_MS = 500  # How often an idle profiler overlay updates
+SEARCH_LIMIT = 200  # Most search results collected per query
+SEARCH_BUDGET_MS = 4  # Search time per frame, the rest continues next frame
+SEARCH_BUILD_MS = 20  # Storage worker time per search index build step
+SEARCH_BUILD_BATCH = 1000  # Tasks read per query while building the index
+WRITE_BEHIND_MS = 250  # Edits within this window go out as one batch
+WRITE_RETRY_MS = 2000  # Delay before retrying edits that failed to save
+RECONNECT_MS = 2000  # Delay before reconnecting after a failed attempt
+RETRY_MAX_MS = 60000  # Longest delay the retries back off to
 BG_COLOR = (232, 224, 200)  # Pokemon-style cream color
 TEXT_COLOR = (48, 48, 48)
 ACCENT_COLOR = (255, 203, 5)  # Pokemon yellow
@@ -33,19 +61,1151 @@ WHITE_COLOR = (248, 248, 248)
 SHADOW_COLOR = (88, 88, 80)
 BORDER_COLOR = (48, 48, 48)
 
-# Database connection
-try:
-    client = MongoClient('mongodb://localhost:27017/',
-                         serverSelectionTimeoutMS=5000)
-    client.server_info()  # Force connection check
-    db = client['hakim_todo']
-    categories_collection = db['categories']
-    tasks_collection = db['tasks']
-    print("✓ Connected to MongoDB successfully!")
-except Exception as e:
-    print(f"✗ Failed to connect to MongoDB: {e}")
-    print("Make sure MongoDB is running on mongodb://localhost:27017/")
-    sys.exit(1)
+
+
+def backoff_ms(base_ms, failures):
+    """Delay before the next retry after failures in a row: base_ms,
+    doubling with each further failure up to RETRY_MAX_MS"""
+    return min(base_ms * 2 ** max(0, failures - 1), RETRY_MAX_MS)
+
+
+def now():
+    """Current time at the millisecond precision MongoDB stores"""
+    moment = datetime.now()
+    return moment.replace(microsecond=moment.microsecond // 1000 * 1000)
+
+
+class StartupTimeline:
+    """Milliseconds from the start of main.py to each startup milestone"""
+
+    def __init__(self, t0):
+        self.t0 = t0
+        self.events = []
+
+    def mark(self, label):
+        """Record a milestone the first time it is reached"""
+        if not self.has(label):
+            self.events.append(
+                (label, (time.perf_counter() - self.t0) * 1000))
+
+    def has(self, label):
+        return any(event[0] == label for event in self.events)
+
+    def summary(self):
+        return ', '.join(f'{label} {ms:.0f}ms' for label, ms in self.events)
+
+
+startup_timeline = StartupTimeline(STARTUP_T0)
+
+
+class FrameProfiler:
+    """Per-phase timings of the main loop, for the F3 overlay and F4 dumps
+
+    Each loop iteration is one frame. lap(phase) adds the time since the
+    previous lap to that phase, so phases must be lapped in loop order.
+    Database operations are counted by the storage backend (pymongo
+    command monitoring or the SQLite trace callback) and attributed to
+    the frame in which they finished.
+    """
+
+    PHASES = ('idle', 'storage', 'events', 'input', 'draw', 'flip')
+
+    def __init__(self, history=600):
+        self.frames = deque(maxlen=history)
+        self.frame_number = 0
+        self.db_operations = 0
+        self._current = None
+        self._last = 0
+
+    def begin_frame(self):
+        self._current = dict.fromkeys(self.PHASES, 0.0)
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self._current[phase] += (now - self._last) * 1000
+        self._last = now
+
+    def end_frame(self, db_operations, drew):
+        """Record the frame, given the backend's running operation count"""
+        self.frame_number += 1
+        frame = {
+            'frame': self.frame_number,
+            'time': time.time(),
+            'busy_ms': sum(self._current.values()) - self._current['idle'],
+            'db_ops': max(0, db_operations - self.db_operations),
+            'drew': drew,
+        }
+        frame.update({f'{phase}_ms': ms for phase, ms in self._current.items()})
+        self.db_operations = db_operations
+        self.frames.append(frame)
+
+    def recent(self, count):
+        """The last count frames that drew something, oldest first"""
+        drawn = [frame for frame in self.frames if frame['drew']]
+        return drawn[-count:]
+
+    def dump(self, path, count=None):
+        """Write the last count frames (all by default) as JSON lines"""
+        frames = list(self.frames)[-count:] if count else self.frames
+        with open(path, 'w') as f:
+            for frame in frames:
+                f.write(json.dumps(frame) + '\n')
+        return len(frames)
+
+
+class StorageWorker:
+    """Runs database commands on a background thread
+
+    Commands are executed in submission order. Their results (or errors)
+    are queued and handed to the callbacks on the UI thread by
+    process_results(), so callbacks can safely touch app state.
+    """
+
+    def __init__(self, notify=None):
+        self.commands = queue.Queue()
+        self.results = queue.Queue()
+        # Called from the worker thread after a result is queued
+        self.notify = notify
+        self.thread = threading.Thread(
+            target=self._run, name='storage-worker', daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, on_done=None, on_error=None):
+        """Queue func(*args) to run on the worker thread"""
+        self.commands.put((func, args, on_done, on_error))
+
+    def _run(self):
+        while True:
+            command = self.commands.get()
+            if command is None:
+                break
+            func, args, on_done, on_error = command
+            try:
+                result = func(*args)
+            except Exception as e:
+                if on_error:
+                    self.results.put((on_error, e))
+                else:
+                    print(f"✗ Database error: {e}")
+            else:
+                if on_done:
+                    self.results.put((on_done, result))
+            if self.notify and (on_done or on_error):
+                self.notify()
+
+    def post(self, callback, value):
+        """Hand value to callback on the UI thread, from any thread"""
+        self.results.put((callback, value))
+        if self.notify:
+            self.notify()
+
+    def process_results(self):
+        """Run callbacks for finished commands, returns how many ran"""
+        processed = 0
+        while True:
+            try:
+                callback, value = self.results.get_nowait()
+            except queue.Empty:
+                return processed
+            callback(value)
+            processed += 1
+
+    def stop(self, timeout=5):
+        """Finish queued commands and stop the worker thread"""
+        self.commands.put(None)
+        self.thread.join(timeout)
+
+
+class DocumentList:
+    """In-memory list of documents ordered newest first by created_at
+
+    Documents are kept in ascending (created_at, _id) order internally with
+    a parallel key list for bisection and an _id index, so inserts, patches
+    and removals are applied as deltas instead of reloading the list.
+    Indexing and iteration are newest first, matching
+    find().sort('created_at', -1).
+
+    While a background reload is in flight (begin_load() without the
+    matching reset()), deltas are also logged and replayed on top of the
+    loaded documents, since the reload ran before those writes.
+    """
+
+    def __init__(self, docs=()):
+        self._loads_started = 0
+        self._loads_done = 0
+        self._replay = []
+        self._set(docs)
+
+    @staticmethod
+    def _key(doc):
+        return (doc['created_at'], doc['_id'])
+
+    def _set(self, docs):
+        self._docs = sorted(docs, key=self._key)
+        self._keys = [self._key(doc) for doc in self._docs]
+        self._index = {doc['_id']: doc for doc in self._docs}
+
+    def begin_load(self):
+        """Mark that a reload was queued; deltas from now on get replayed"""
+        self._loads_started += 1
+
+    def reset(self, docs):
+        """Replace the contents with a freshly loaded set of documents"""
+        self._set(docs)
+        self._finish_load()
+
+    def merge(self, docs):
+        """Add a freshly loaded batch of documents (e.g. another page)"""
+        for doc in docs:
+            self._insert(doc)
+        self._finish_load()
+
+    def cancel_load(self):
+        """The reload queued by begin_load() failed"""
+        self._finish_load(replay=False)
+
+    def _finish_load(self, replay=True):
+        if self._loads_done < self._loads_started:
+            self._loads_done += 1
+            if replay:
+                for load, method, args in self._replay:
+                    method(*args)
+            # Deltas logged before the next reload was queued are already
+            # part of that reload's result
+            self._replay = [entry for entry in self._replay
+                            if entry[0] > self._loads_done]
+
+    def _log(self, method, *args):
+        if self._loads_done < self._loads_started:
+            self._replay.append((self._loads_started, method, args))
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._docs)
+        if not 0 <= i < len(self._docs):
+            raise IndexError('DocumentList index out of range')
+        return self._docs[len(self._docs) - 1 - i]
+
+    def __iter__(self):
+        return reversed(self._docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._index
+
+    def get(self, doc_id):
+        """Return the document with this _id, or None"""
+        return self._index.get(doc_id)
+
+    def _position(self, doc):
+        return bisect.bisect_left(self._keys, self._key(doc))
+
+    def index_of(self, doc_id):
+        """Return the newest-first index of a document, or -1"""
+        doc = self._index.get(doc_id)
+        if doc is None:
+            return -1
+        return len(self._docs) - 1 - self._position(doc)
+
+    def insert(self, doc):
+        """Insert a document at its sorted position"""
+        self._log(self._apply_insert, doc)
+        self._apply_insert(doc)
+
+    def patch(self, doc_id, fields):
+        """Update fields of a document in place, returns the document"""
+        self._log(self._patch, doc_id, fields)
+        return self._patch(doc_id, fields)
+
+    def remove(self, doc_id):
+        """Remove a document by _id, returns the removed document"""
+        self._log(self._remove, doc_id)
+        return self._remove(doc_id)
+
+    def _apply_insert(self, doc):
+        # An insert() delta, replayed after a reload as well, so
+        # subclasses that filter inserts override this
+        self._insert(doc)
+
+    def _insert(self, doc):
+        if doc['_id'] in self._index:
+            self._remove(doc['_id'])
+        position = bisect.bisect_right(self._keys, self._key(doc))
+        self._docs.insert(position, doc)
+        self._keys.insert(position, self._key(doc))
+        self._index[doc['_id']] = doc
+
+    def _patch(self, doc_id, fields):
+        doc = self._index.get(doc_id)
+        if doc is None:
+            return None
+        if 'created_at' in fields:
+            self._remove(doc_id)
+            doc.update(fields)
+            self._insert(doc)
+        else:
+            doc.update(fields)
+        return doc
+
+    def _remove(self, doc_id):
+        doc = self._index.pop(doc_id, None)
+        if doc is None:
+            return None
+        position = self._position(doc)
+        del self._docs[position]
+        del self._keys[position]
+        return doc
+
+
+class TaskWindow(DocumentList):
+    """Keyset-paged window over the tasks of one category
+
+    Only the pages around the scroll position are kept in memory. Pages
+    are fetched with (created_at, _id) keyset cursors next to the loaded
+    range, or by position when the view jumps far away. offset is the
+    position of the newest loaded task in the category's (filtered) task
+    list; at_start/at_end tell whether the window reaches either end.
+    """
+
+    PAGE_SIZE = 50
+    MAX_SIZE = 200  # Tasks kept in memory
+    PREFETCH = 10  # Rows from the window edge that trigger the next page
+
+    def __init__(self, category_id, completed=None, fetch=None):
+        super().__init__()
+        self.category_id = category_id
+        # None for all tasks, False for undone only, True for done only
+        self.completed = completed
+        # fetch(window, direction, key, skip) queues a page load
+        self.fetch = fetch
+        self.offset = 0
+        self.at_start = True
+        self.at_end = False
+        self.pending = set()
+        # Inserted tasks newer than the window, counted in offset only
+        self._above = set()
+
+    def matches(self, doc):
+        return self.completed is None or doc['completed'] == self.completed
+
+    def total(self, counts):
+        """Length of the full task list, given (total, completed) counts"""
+        if self.at_start and self.at_end:
+            return len(self)
+        total, completed = counts
+        if self.completed is True:
+            total = completed
+        elif self.completed is False:
+            total -= completed
+        return max(total, self.offset + len(self))
+
+    def at(self, position):
+        """Task at a position of the full list, None if not loaded"""
+        i = position - self.offset
+        if 0 <= i < len(self):
+            return self[i]
+        return None
+
+    def ensure_range(self, start, end):
+        """Request the page needed to show rows [start, end)"""
+        if self.pending:
+            return
+        loaded_end = self.offset + len(self)
+        if (not self._docs and not (self.at_start and self.at_end)) or \
+                end <= self.offset - self.PAGE_SIZE or \
+                start >= loaded_end + self.PAGE_SIZE:
+            # Nothing loaded near the view: jump there by position
+            self._request('jump', skip=max(0, start - self.PREFETCH))
+        elif end + self.PREFETCH > loaded_end and not self.at_end:
+            self._request('next', key=self._key(self[-1]))
+        elif start - self.PREFETCH < self.offset and not self.at_start:
+            self._request('prev', key=self._key(self[0]))
+
+    def _request(self, direction, key=None, skip=0):
+        self.pending.add(direction)
+        self.begin_load()
+        self.fetch(self, direction, key, skip)
+
+    def page_loaded(self, direction, skip, page):
+        """Merge a fetched page and trim the window to MAX_SIZE
+
+        The range is updated before the page goes in, so the inserts
+        replayed on top of it are filtered against the new range.
+        """
+        self.pending.discard(direction)
+        full_page = len(page) == self.PAGE_SIZE
+        if direction == 'jump':
+            self.offset = skip
+            self.at_start = skip == 0
+            self.at_end = not full_page
+            self._above.clear()
+            self.reset(page)
+        elif direction == 'next':
+            self.at_end = not full_page
+            self.merge(page)
+            self._trim(newest=True)
+        else:
+            self.offset = max(0, self.offset - len(page))
+            if not full_page:
+                self.at_start = True
+                self.offset = 0
+                self._above.clear()
+            self.merge(page)
+            self._trim(newest=False)
+
+    def page_failed(self, direction):
+        self.pending.discard(direction)
+        self.cancel_load()
+
+    def _trim(self, newest):
+        """Drop tasks beyond MAX_SIZE from the newest or oldest end"""
+        excess = len(self._docs) - self.MAX_SIZE
+        if excess <= 0:
+            return
+        if newest:
+            dropped = self._docs[-excess:]
+            del self._docs[-excess:]
+            del self._keys[-excess:]
+            self.offset += excess
+            self.at_start = False
+        else:
+            dropped = self._docs[:excess]
+            del self._docs[:excess]
+            del self._keys[:excess]
+            self.at_end = False
+        for doc in dropped:
+            del self._index[doc['_id']]
+
+    def _apply_insert(self, doc):
+        # Insert a task if it falls inside the loaded range. Replaying
+        # one already applied must not shift the window twice.
+        if not self.matches(doc):
+            return
+        if self._docs:
+            key = self._key(doc)
+            if not self.at_start and key > self._keys[-1]:
+                # Newer than anything loaded: it only shifts the window
+                if doc['_id'] not in self._above:
+                    self._above.add(doc['_id'])
+                    self.offset += 1
+                return
+            if not self.at_end and key < self._keys[0]:
+                return
+        if doc['_id'] in self._above:
+            # A page reached it: it is in the window now, not before it
+            self._above.discard(doc['_id'])
+            self.offset -= 1
+        self._insert(doc)
+
+    def patch(self, doc_id, fields):
+        """Update a task, dropping it if it no longer matches the filter"""
+        doc = super().patch(doc_id, fields)
+        if doc is not None and not self.matches(doc):
+            self.remove(doc_id)
+        return doc
+
+    def _leaves_before_window(self, doc):
+        """Whether doc is newer than the loaded range and in the list"""
+        return (self.matches(doc) and bool(self._docs) and not self.at_start
+                and self._key(doc) > self._keys[-1])
+
+    def patch_many(self, docs, fields):
+        """Update tasks that may lie outside the loaded range"""
+        for doc in docs:
+            if doc['_id'] in self._index:
+                self.patch(doc['_id'], fields)
+            elif not self.matches(doc) and \
+                    self.matches(dict(doc, **fields)):
+                # It joins the filtered list
+                self.insert(dict(doc, **fields))
+            elif self._leaves_before_window(doc) and \
+                    not self.matches(dict(doc, **fields)):
+                # It drops out of the filtered list above the window
+                self.offset = max(0, self.offset - 1)
+
+    def remove_many(self, docs):
+        """Remove tasks that may lie outside the loaded range"""
+        for doc in docs:
+            if doc['_id'] in self._index:
+                self.remove(doc['_id'])
+            elif self._leaves_before_window(doc):
+                self._above.discard(doc['_id'])
+                self.offset = max(0, self.offset - 1)
+
+
+class TaskViews:
+    """The task windows of one category, one per completion filter
+
+    Windows of every filter opened since entering the category stay in
+    memory and receive the same inserts, patches and removals as the one
+    on screen, so toggling "Show only undone" switches to a window that
+    is already current instead of reloading it. A filtered window opened
+    while the unfiltered one holds the whole category is taken from it
+    in one pass instead of being queried.
+    """
+
+    def __init__(self, category_id, fetch=None):
+        self.category_id = category_id
+        self.fetch = fetch
+        self.windows = {}  # completed filter -> TaskWindow
+
+    def __iter__(self):
+        return iter(list(self.windows.values()))
+
+    def __contains__(self, task_id):
+        return any(task_id in window for window in self)
+
+    @property
+    def complete(self):
+        """Whether every window holds its whole filtered list"""
+        return all(window.at_start and window.at_end for window in self)
+
+    def window(self, completed=None):
+        """The window of a filter, created on first use"""
+        window = self.windows.get(completed)
+        if window is None:
+            window = TaskWindow(self.category_id, completed, self.fetch)
+            source = self.windows.get(None)
+            if (completed is not None and source is not None
+                    and source.at_start and source.at_end
+                    and not source.pending):
+                window.reset([dict(doc) for doc in source._docs
+                              if window.matches(doc)])
+                window.at_end = True
+            self.windows[completed] = window
+        return window
+
+    def get(self, task_id):
+        """The task with this _id from any window, or None"""
+        for window in self:
+            doc = window.get(task_id)
+            if doc is not None:
+                return doc
+        return None
+
+    def insert(self, doc):
+        for window in self:
+            window.insert(dict(doc))
+
+    def patch(self, task_id, fields):
+        """Update a task in every window, returns its previous state"""
+        doc = self.get(task_id)
+        if doc is not None:
+            doc = dict(doc)
+            self.patch_many([doc], fields)
+        return doc
+
+    def patch_many(self, docs, fields):
+        # Windows may hold the same documents: compare against copies
+        docs = [dict(doc) for doc in docs]
+        for window in self:
+            window.patch_many(docs, fields)
+
+    def remove(self, task_id):
+        """Remove a task from every window, returns it"""
+        removed = None
+        for window in self:
+            removed = window.remove(task_id) or removed
+        return removed
+
+    def remove_many(self, docs):
+        docs = [dict(doc) for doc in docs]
+        for window in self:
+            window.remove_many(docs)
+
+
+class TaskSelection:
+    """Tasks picked in the tasks view's selection mode
+
+    Either the tasks in docs, or with all set every task of the filtered
+    view except the ones in docs, so "select all" works without loading
+    the whole category. docs maps _id to the task document.
+    """
+
+    def __init__(self):
+        self.all = False
+        self.docs = {}
+        self.anchor = None  # Position of the last plain click
+
+    def __contains__(self, task_id):
+        return (task_id in self.docs) != self.all
+
+    def count(self, total):
+        """Number of selected tasks, given the filtered task count"""
+        return total - len(self.docs) if self.all else len(self.docs)
+
+    def set(self, doc, selected):
+        if selected != self.all:
+            self.docs[doc['_id']] = doc
+        else:
+            self.docs.pop(doc['_id'], None)
+
+    def toggle(self, doc):
+        self.set(doc, doc['_id'] not in self)
+
+    def select_all(self):
+        self.all = True
+        self.docs = {}
+
+    def clear(self):
+        self.all = False
+        self.docs = {}
+        self.anchor = None
+
+
+class SearchIndex:
+    """In-memory inverted index over task names, across all categories
+
+    Every indexed task gets a slot; postings map a token to the slots of
+    the tasks whose name contains it (an int for one task, an ascending
+    array for more). Renaming a task moves it to a new slot and removing
+    it leaves None in its old one, so postings are only ever appended to.
+    Dead slots are skipped by search() and dropped by compact(). Later
+    slots were indexed later, so results come out roughly newest first.
+
+    Entries are (task_id, category_id, name, completed) tuples. Bulk
+    methods take the same selectors as the storage backends'
+    update_tasks/delete_tasks.
+    """
+
+    # Prefixes matching more tokens than this scan every task instead
+    MAX_PREFIX_TOKENS = 64
+    # Candidates checked between the None yields of search()
+    SCAN_STEP = 1024
+    COMPACT_MIN_DEAD = 10000
+
+    def __init__(self, tasks=()):
+        self._entries = []
+        self._slots = {}  # task_id -> slot
+        self._postings = {}  # token -> slot or array of slots
+        self._by_category = {}  # category_id -> array of slots
+        self._dead = 0
+        self.version = 0  # Bumped on every change
+        self._vocabulary = []
+        self._vocabulary_sorted = True
+        self.extend(tasks)
+
+    WORD = re.compile(r'\w+')
+
+    @classmethod
+    def tokens(cls, text):
+        return set(cls.WORD.findall(text.lower()))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, task_id):
+        return task_id in self._slots
+
+    def get(self, task_id):
+        """The entry of a task, or None"""
+        slot = self._slots.get(task_id)
+        return None if slot is None else self._entries[slot]
+
+    def selected(self, selector):
+        """Entries of the tasks a selector picks"""
+        return [self._entries[slot] for slot in self._selected_slots(selector)]
+
+    @staticmethod
+    def _sequence(postings):
+        return (postings,) if isinstance(postings, int) else postings
+
+    def _add(self, entry):
+        """Index an entry in a new slot, returns the tokens it added"""
+        slot = len(self._entries)
+        self._entries.append(entry)
+        self._slots[entry[0]] = slot
+        by_category = self._by_category.get(entry[1])
+        if by_category is None:
+            by_category = self._by_category[entry[1]] = array('i')
+        by_category.append(slot)
+        postings = self._postings
+        new_tokens = []
+        for token in self.tokens(entry[2]):
+            found = postings.get(token)
+            if found is None:
+                postings[token] = slot
+                new_tokens.append(token)
+            elif isinstance(found, int):
+                postings[token] = array('i', (found, slot))
+            else:
+                found.append(slot)
+        return new_tokens
+
+    def _kill(self, slot):
+        self._entries[slot] = None
+        self._dead += 1
+
+    def extend(self, tasks):
+        """Index a batch of new tasks, cheaper than add() for each
+
+        Each batch's new tokens go to the end of the vocabulary as one
+        sorted run, merged with the others by sort_vocabulary().
+        """
+        new_tokens = []
+        for task in tasks:
+            new_tokens += self._add((task['_id'], task['category_id'],
+                                     task['name'], task['completed']))
+        if new_tokens:
+            new_tokens.sort()
+            self._vocabulary += new_tokens
+            self._vocabulary_sorted = False
+
+    def sort_vocabulary(self):
+        """Merge the runs extend() appended (a no-op when sorted)"""
+        if not self._vocabulary_sorted:
+            self._vocabulary.sort()
+            self._vocabulary_sorted = True
+
+    def add(self, task):
+        """Index a new task (or re-index an existing one)"""
+        if task['_id'] in self._slots:
+            self._kill(self._slots.pop(task['_id']))
+        new_tokens = self._add((task['_id'], task['category_id'],
+                                task['name'], task['completed']))
+        self.sort_vocabulary()
+        for token in new_tokens:
+            bisect.insort(self._vocabulary, token)
+        self.version += 1
+        self._maybe_compact()
+
+    def rename(self, task_id, name):
+        slot = self._slots.get(task_id)
+        if slot is not None:
+            task_id, category_id, _, completed = self._entries[slot]
+            self.add({'_id': task_id, 'category_id': category_id,
+                      'name': name, 'completed': completed})
+
+    def set_completed(self, task_id, completed):
+        slot = self._slots.get(task_id)
+        if slot is not None:
+            self._entries[slot] = self._entries[slot][:3] + (completed,)
+            self.version += 1
+
+    def remove(self, task_id):
+        slot = self._slots.pop(task_id, None)
+        if slot is not None:
+            self._kill(slot)
+            self.version += 1
+            self._maybe_compact()
+
+    def _selected_slots(self, selector):
+        if 'ids' in selector:
+            return [self._slots[task_id] for task_id in selector['ids']
+                    if task_id in self._slots]
+        completed = selector.get('completed')
+        exclude = set(selector.get('exclude', ()))
+        slots = []
+        for slot in self._by_category.get(selector['category_id'], ()):
+            entry = self._entries[slot]
+            if entry is not None and entry[0] not in exclude and (
+                    completed is None or entry[3] == completed):
+                slots.append(slot)
+        return slots
+
+    def update_selected(self, selector, completed):
+        for slot in self._selected_slots(selector):
+            self._entries[slot] = self._entries[slot][:3] + (completed,)
+        self.version += 1
+
+    def remove_selected(self, selector):
+        for slot in self._selected_slots(selector):
+            del self._slots[self._entries[slot][0]]
+            self._kill(slot)
+        self.version += 1
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._dead > max(self.COMPACT_MIN_DEAD, len(self._slots)):
+            self.compact()
+
+    def compact(self):
+        """Rebuild without dead slots or tokens, keeping the order"""
+        live = [entry for entry in self._entries if entry is not None]
+        self._entries = []
+        self._slots = {}
+        self._postings = {}
+        self._by_category = {}
+        self._dead = 0
+        for entry in live:
+            self._add(entry)
+        self._vocabulary = sorted(self._postings)
+        self._vocabulary_sorted = True
+        self.version += 1
+
+    def _expand(self, prefix):
+        """Tokens starting with prefix, None if there are too many"""
+        self.sort_vocabulary()
+        tokens = []
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and \
+                self._vocabulary[i].startswith(prefix):
+            if len(tokens) == self.MAX_PREFIX_TOKENS:
+                return None
+            tokens.append(self._vocabulary[i])
+            i += 1
+        return tokens
+
+    def search(self, query):
+        """Yield entries of tasks matching every word of query, newest
+        first. The last word matches as a prefix unless the query ends
+        with a space.
+
+        Also yields None every SCAN_STEP candidates, so callers can stop
+        on a time budget and resume the generator later.
+        """
+        words = self.WORD.findall(query.lower())
+        if not words:
+            return
+        prefix = None if query[-1].isspace() else words.pop()
+        full = set(words)
+
+        # Scan the shortest candidate list, newest slot first
+        candidates = []  # (length, newest-first slots)
+        for word in full:
+            postings = self._postings.get(word)
+            if postings is None:
+                return
+            postings = self._sequence(postings)
+            candidates.append((len(postings), reversed(postings)))
+        if prefix is not None:
+            expanded = self._expand(prefix)
+            if expanded == []:
+                return
+            if expanded is not None:
+                lists = [self._sequence(self._postings[token])
+                         for token in expanded]
+                candidates.append((
+                    sum(len(postings) for postings in lists),
+                    heapq.merge(*(reversed(postings) for postings in lists),
+                                reverse=True)))
+        if candidates:
+            slots = min(candidates, key=lambda candidate: candidate[0])[1]
+        else:
+            slots = range(len(self._entries) - 1, -1, -1)
+
+        last = None
+        for scanned, slot in enumerate(slots, 1):
+            if scanned % self.SCAN_STEP == 0:
+                yield None
+            if slot == last:
+                # The same task under two tokens with the prefix
+                continue
+            last = slot
+            entry = self._entries[slot]
+            if entry is None:
+                continue
+            tokens = self.tokens(entry[2])
+            if full <= tokens and (prefix is None or any(
+                    token.startswith(prefix) for token in tokens)):
+                yield entry
+
+
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces
+
+    Keyed by (font, text, antialias, color) so labels that are drawn every
+    frame are rasterized once. Hit/miss counters show whether steady-state
+    frames still allocate new surfaces.
+    """
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color):
+        """Return font.render(text, antialias, color), cached"""
+        key = (font, text, antialias, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def stats(self):
+        """Return cache counters as a dict"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.surfaces),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class TextMetrics:
+    """Cached prefix-width tables for measuring text without rendering
+
+    For each (font, string) the cumulative glyph advances are computed
+    once with font.metrics(), so widths of prefixes, ellipsis truncation
+    and mapping an x position to a character index are lookups and
+    binary searches.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.tables = OrderedDict()
+
+    def prefix_widths(self, font, text):
+        """Return widths where widths[i] is the width of text[:i]"""
+        key = (font, text)
+        widths = self.tables.get(key)
+        if widths is not None:
+            self.tables.move_to_end(key)
+            return widths
+
+        widths = [0]
+        total = 0
+        for char, metrics in zip(text, font.metrics(text)):
+            # Glyphs missing from the font have no metrics
+            total += metrics[4] if metrics else font.size(char)[0]
+            widths.append(total)
+        self.tables[key] = widths
+        if len(self.tables) > self.max_size:
+            self.tables.popitem(last=False)
+        return widths
+
+    def width(self, font, text, end=None):
+        """Width of text[:end] (all of text by default)"""
+        widths = self.prefix_widths(font, text)
+        return widths[-1] if end is None else widths[end]
+
+    def truncate(self, font, text, max_width, ellipsis='...'):
+        """Shorten text with an ellipsis so it fits in max_width"""
+        widths = self.prefix_widths(font, text)
+        if widths[-1] <= max_width:
+            return text
+        budget = max_width - self.width(font, ellipsis)
+        end = max(0, bisect.bisect_right(widths, budget) - 1)
+        return text[:end] + ellipsis
+
+    def index_at(self, font, text, x):
+        """Index of the character boundary closest to x pixels"""
+        widths = self.prefix_widths(font, text)
+        i = bisect.bisect_left(widths, x)
+        if i >= len(widths):
+            return len(text)
+        if i > 0 and x - widths[i - 1] <= widths[i] - x:
+            return i - 1
+        return i
+
+
+class TextLayout:
+    """Bounded LRU cache of word-wrapped line breaks
+
+    Lines are computed once per (font, text, width) from the prefix-width
+    tables of TextMetrics, so even long notes are wrapped without
+    rendering anything and only the lines on screen are ever rasterized.
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.layouts = OrderedDict()
+
+    def lines(self, font, text, max_width):
+        """text broken into lines no wider than max_width
+
+        Breaks at spaces where possible; a word wider than a whole line
+        is split between characters. Newlines always start a new line.
+        """
+        key = (font, text, max_width)
+        lines = self.layouts.get(key)
+        if lines is not None:
+            self.layouts.move_to_end(key)
+            return lines
+
+        lines = []
+        for paragraph in text.split('\n'):
+            self._wrap(font, paragraph, max_width, lines)
+        self.layouts[key] = lines
+        if len(self.layouts) > self.max_size:
+            self.layouts.popitem(last=False)
+        return lines
+
+    @staticmethod
+    def _wrap(font, text, max_width, lines):
+        widths = text_metrics.prefix_widths(font, text)
+        start = 0
+        while True:
+            # Longest run from start that fits
+            end = bisect.bisect_right(
+                widths, widths[start] + max_width, start) - 1
+            if end >= len(text):
+                lines.append(text[start:])
+                return
+            space = text.rfind(' ', start, end + 1)
+            if space > start:
+                lines.append(text[start:space])
+                start = space + 1
+            else:
+                end = max(end, start + 1)
+                lines.append(text[start:end])
+                start = end
+
+
+class ChromeCache:
+    """Bounded LRU cache of pre-rendered static chrome
+
+    Box, button and input box frames, scrollbar thumbs and whole view
+    backgrounds are painted once per (kind, size, colors) into a surface
+    and blitted in one call per frame afterwards. Only dynamic content
+    (text, badges, the cursor) is drawn on top of them.
+    """
+
+    # Never drawn by the app: marks see-through pixels (box shadows
+    # leave two corners of their surface empty)
+    COLORKEY = (255, 0, 255)
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, size, paint, *args, transparent=True):
+        """Surface of the given size painted by paint(surface, *args),
+        cached under key"""
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = pygame.Surface(size)
+        if transparent:
+            surface.fill(self.COLORKEY)
+            surface.set_colorkey(self.COLORKEY, pygame.RLEACCEL)
+        paint(surface, *args)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class HitMap:
+    """Clickable regions laid out by the last draw pass
+
+    Views register each card and card button while drawing it; hover
+    effects and click dispatch look regions up here instead of
+    rebuilding the layout. Regions are bucketed into horizontal bands,
+    and a region added later lies on top of the earlier ones it overlaps.
+    """
+
+    BAND = 64  # Band height in pixels
+
+    def __init__(self):
+        self.bands = {}
+
+    def clear(self):
+        self.bands.clear()
+
+    def add(self, rect, action=None, *args):
+        """Register rect, a click on it calls action(*args)
+
+        Returns the region, to compare with at() for hover effects.
+        """
+        region = (pygame.Rect(rect), action, args)
+        for band in range(rect.top // self.BAND,
+                          (rect.bottom - 1) // self.BAND + 1):
+            self.bands.setdefault(band, []).append(region)
+        return region
+
+    def at(self, pos):
+        """Topmost region under pos, or None"""
+        for region in reversed(self.bands.get(pos[1] // self.BAND, ())):
+            if region[0].collidepoint(pos):
+                return region
+        return None
+
+    def click(self, pos):
+        """Run the action of the region under pos, True if there was one"""
+        region = self.at(pos)
+        if region is None or region[1] is None:
+            return False
+        # The action may change the layout, the next draw rebuilds it
+        self.clear()
+        region[1](*region[2])
+        return True
+
+
+class SpriteAtlas:
+    """All sprites in one surface, converted to the display format once
+
+    Loads the atlas.png/atlas.json pair written by create_sprites.py.
+    Sprites are subsurfaces of the atlas, so blitting one copies a
+    sub-rect of an image that already matches the screen. Sprites the
+    atlas lacks (or all of them, when it cannot be read) are drawn by
+    create_sprites and packed into the atlas instead.
+    """
+
+    def __init__(self, image_path, index_path):
+        try:
+            image = pygame.image.load(image_path)
+            with open(index_path) as f:
+                index = self._valid_rects(json.load(f), image.get_rect())
+        except (OSError, ValueError, pygame.error) as e:
+            print(f"⚠ Could not load sprite atlas: {e}")
+            image, index = None, {}
+        self.missing = [name for name in SPRITES if name not in index]
+        if self.missing:
+            # Repack with generated stand-ins for what is missing
+            sprites = {name: image.subsurface(rect)
+                       for name, rect in index.items()}
+            sprites.update(
+                (name, SPRITES[name]()) for name in self.missing)
+            image, index = pack_atlas(sprites)
+        self.image = image.convert_alpha()
+        self.sprites = {name: self.image.subsurface(rect)
+                        for name, rect in index.items()}
+
+    @staticmethod
+    def _valid_rects(index, bounds):
+        """The entries of a loaded index that name a sprite with a rect
+        inside the atlas image; the rest count as missing"""
+        if not isinstance(index, dict):
+            raise ValueError('atlas index is not a JSON object')
+        rects = {}
+        for name, rect in index.items():
+            try:
+                rect = pygame.Rect(rect)
+            except TypeError:
+                continue
+            if name in SPRITES and rect.width and rect.height \
+                    and bounds.contains(rect):
+                rects[name] = rect
+        return rects
+
+    def get(self, name):
+        return self.sprites[name]
+
+
+# Shared by Button, InputBox and the views
+text_cache = TextCache()
+text_metrics = TextMetrics()
+text_layout = TextLayout()
+chrome_cache = ChromeCache()
 
 
 class Button:
@@ -58,32 +1218,41 @@ class Button:
         self.text_color = text_color
         self.hovered = False
 
-    def draw(self, screen, font):
+    @staticmethod
+    def paint(surface, size, color, hovered):
+        """Paint the button background (with its shadow) at the origin"""
+        rect = pygame.Rect((0, 0), size)
+
         # Pixel-perfect shadow (offset by 4 pixels)
-        shadow_rect = self.rect.copy()
-        shadow_rect.x += 4
-        shadow_rect.y += 4
-        pygame.draw.rect(screen, SHADOW_COLOR, shadow_rect)
+        pygame.draw.rect(surface, SHADOW_COLOR, rect.move(4, 4))
 
         # Main button with thick pixel border
-        color = tuple(min(c + 20, 255)
-                      for c in self.color) if self.hovered else self.color
-        pygame.draw.rect(screen, color, self.rect)
+        if hovered:
+            color = tuple(min(c + 20, 255) for c in color)
+        pygame.draw.rect(surface, color, rect)
 
         # Thick 4px pixel border
-        pygame.draw.rect(screen, BORDER_COLOR, self.rect, 4)
+        pygame.draw.rect(surface, BORDER_COLOR, rect, 4)
 
         # Inner highlight for 3D effect (top-left)
-        if not self.hovered:
-            pygame.draw.line(screen, WHITE_COLOR,
-                             (self.rect.x + 4, self.rect.y + 4),
-                             (self.rect.right - 4, self.rect.y + 4), 2)
-            pygame.draw.line(screen, WHITE_COLOR,
-                             (self.rect.x + 4, self.rect.y + 4),
-                             (self.rect.x + 4, self.rect.bottom - 4), 2)
+        if not hovered:
+            pygame.draw.line(surface, WHITE_COLOR, (4, 4),
+                             (rect.right - 4, 4), 2)
+            pygame.draw.line(surface, WHITE_COLOR, (4, 4),
+                             (4, rect.bottom - 4), 2)
+
+    def draw(self, screen, font):
+        # Background from the chrome cache
+        size = self.rect.size
+        background = chrome_cache.get(
+            ('button', size, self.color, self.hovered),
+            (size[0] + 4, size[1] + 4), self.paint, size, self.color,
+            self.hovered)
+        screen.blit(background, self.rect.topleft)
 
         # Draw text (centered, pixelated)
-        text_surface = font.render(self.text, False, self.text_color)
+        text_surface = text_cache.render(
+            font, self.text, False, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
 
@@ -99,6 +1268,15 @@ class PixelBox:
     """Retro pixel art dialog box"""
     @staticmethod
     def draw(screen, rect, color=WHITE_COLOR, border_size=4):
+        """Blit the box (painted once per size and colors) at rect"""
+        box = chrome_cache.get(
+            ('box', rect.size, tuple(color), border_size),
+            (rect.width + 4, rect.height + 4), PixelBox.paint,
+            pygame.Rect((0, 0), rect.size), color, border_size)
+        screen.blit(box, rect.topleft)
+
+    @staticmethod
+    def paint(screen, rect, color=WHITE_COLOR, border_size=4):
         # Shadow
         shadow_rect = rect.copy()
         shadow_rect.x += 4
@@ -119,6 +1297,12 @@ class PixelBox:
                          (rect.x + border_size, rect.y + border_size),
                          (rect.x + border_size, rect.bottom - border_size), 2)
 
+    @staticmethod
+    def paint_frame(screen, rect, color, border_width):
+        """Flat box with a border, as used by scrollbars"""
+        pygame.draw.rect(screen, color, rect)
+        pygame.draw.rect(screen, BORDER_COLOR, rect, border_width)
+
 
 class InputBox:
     """Pixelated input box for text entry"""
@@ -129,14 +1313,14 @@ class InputBox:
         self.placeholder = placeholder
         self.active = False
         self.cursor_visible = True
-        self.cursor_timer = 0
+        self.cursor_timer = 0  # Tick of the last cursor blink
         self.scroll_offset = 0
         self.cursor_position = 0  # Cursor position in text
 
         # For key repeat functionality
-        self.key_repeat_timer = 0
-        self.key_repeat_delay = 20  # Frames before repeat starts
-        self.key_repeat_interval = 3  # Frames between repeats
+        self.key_repeat_timer = 0  # Tick of the next repeat
+        self.key_repeat_delay = 333  # Milliseconds before repeat starts
+        self.key_repeat_interval = 50  # Milliseconds between repeats
         self.current_key = None
         self.font = None  # Will be set when drawing
 
@@ -149,16 +1333,8 @@ class InputBox:
                     click_x = event.pos[0] - \
                         (self.rect.x + 12) + self.scroll_offset
                     # Find the closest character position
-                    best_pos = len(self.text)
-                    best_diff = float('inf')
-                    for i in range(len(self.text) + 1):
-                        text_width = self.font.render(
-                            self.text[:i], False, TEXT_COLOR).get_width()
-                        diff = abs(text_width - click_x)
-                        if diff < best_diff:
-                            best_diff = diff
-                            best_pos = i
-                    self.cursor_position = best_pos
+                    self.cursor_position = text_metrics.index_at(
+                        self.font, self.text, click_x)
                 else:
                     self.cursor_position = len(self.text)
 
@@ -166,7 +1342,7 @@ class InputBox:
             # Store the current key for repeat functionality
             if event.key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_BACKSPACE, pygame.K_DELETE):
                 self.current_key = event.key
-                self.key_repeat_timer = 0
+                self.key_repeat_timer = pygame.time.get_ticks() + self.key_repeat_delay
 
             # Handle Ctrl+C (copy)
             if event.key == pygame.K_c and (event.mod & pygame.KMOD_CTRL):
@@ -224,66 +1400,68 @@ class InputBox:
         return False
 
     def update(self):
+        """Advance cursor blink and key repeat, returns True if it changed"""
+        changed = False
+        now = pygame.time.get_ticks()
+
         # Blinking cursor
-        self.cursor_timer += 1
-        if self.cursor_timer > 30:
+        if now - self.cursor_timer >= CURSOR_BLINK_MS:
             self.cursor_visible = not self.cursor_visible
-            self.cursor_timer = 0
+            self.cursor_timer = now
+            changed = self.active
 
         # Handle key repeat for navigation keys
         if self.active and self.current_key:
-            self.key_repeat_timer += 1
-
             # After initial delay, repeat the key action
-            if self.key_repeat_timer > self.key_repeat_delay:
-                if (self.key_repeat_timer - self.key_repeat_delay) % self.key_repeat_interval == 0:
-                    # Perform the key action
-                    if self.current_key == pygame.K_LEFT:
-                        self.cursor_position = max(0, self.cursor_position - 1)
-                    elif self.current_key == pygame.K_RIGHT:
-                        self.cursor_position = min(
-                            len(self.text), self.cursor_position + 1)
-                    elif self.current_key == pygame.K_BACKSPACE:
-                        if self.cursor_position > 0:
-                            self.text = self.text[:self.cursor_position -
-                                                  1] + self.text[self.cursor_position:]
-                            self.cursor_position -= 1
-                    elif self.current_key == pygame.K_DELETE:
-                        if self.cursor_position < len(self.text):
-                            self.text = self.text[:self.cursor_position] + \
-                                self.text[self.cursor_position + 1:]
+            while now >= self.key_repeat_timer:
+                self.key_repeat_timer += self.key_repeat_interval
+                changed = True
+                # Perform the key action
+                if self.current_key == pygame.K_LEFT:
+                    self.cursor_position = max(0, self.cursor_position - 1)
+                elif self.current_key == pygame.K_RIGHT:
+                    self.cursor_position = min(
+                        len(self.text), self.cursor_position + 1)
+                elif self.current_key == pygame.K_BACKSPACE:
+                    if self.cursor_position > 0:
+                        self.text = self.text[:self.cursor_position -
+                                              1] + self.text[self.cursor_position:]
+                        self.cursor_position -= 1
+                elif self.current_key == pygame.K_DELETE:
+                    if self.cursor_position < len(self.text):
+                        self.text = self.text[:self.cursor_position] + \
+                            self.text[self.cursor_position + 1:]
+
+        return changed
+
+    def next_update_in(self):
+        """Milliseconds until update() has something to do, or None"""
+        if not self.active:
+            return None
+        now = pygame.time.get_ticks()
+        wait = self.cursor_timer + CURSOR_BLINK_MS - now
+        if self.current_key:
+            wait = min(wait, self.key_repeat_timer - now)
+        return max(0, wait)
 
     def draw(self, screen, font):
         # Store font for cursor positioning on click
         self.font = font
 
-        # Draw input box with pixel style
-        if self.active:
-            pygame.draw.rect(screen, ACCENT_COLOR, self.rect)
-        else:
-            pygame.draw.rect(screen, WHITE_COLOR, self.rect)
-
-        # Thick border
-        border_color = ACCENT_COLOR if self.active else BORDER_COLOR
-        pygame.draw.rect(screen, border_color, self.rect, 4)
-
-        # Inner shadow for inset effect
-        pygame.draw.line(screen, SHADOW_COLOR,
-                         (self.rect.x + 4, self.rect.y + 4),
-                         (self.rect.right - 4, self.rect.y + 4), 2)
-        pygame.draw.line(screen, SHADOW_COLOR,
-                         (self.rect.x + 4, self.rect.y + 4),
-                         (self.rect.x + 4, self.rect.bottom - 4), 2)
+        # Frame from the chrome cache
+        frame = chrome_cache.get(
+            ('input', self.rect.size, self.active), self.rect.size,
+            self.paint, self.active, transparent=False)
+        screen.blit(frame, self.rect.topleft)
 
         # Draw text or placeholder with scrolling
         display_text = self.text if self.text else self.placeholder
         text_color = TEXT_COLOR if self.text else (120, 120, 120)
-        text_surface = font.render(display_text, False, text_color)
+        text_surface = text_cache.render(font, display_text, False, text_color)
 
         # Calculate cursor position in pixels
-        cursor_text = self.text[:self.cursor_position]
-        cursor_x_offset = font.render(
-            cursor_text, False, text_color).get_width() if cursor_text else 0
+        cursor_x_offset = text_metrics.width(
+            font, self.text, self.cursor_position)
 
         # Calculate scroll offset to keep cursor visible
         text_width = text_surface.get_width()
@@ -303,7 +1481,9 @@ class InputBox:
         # Create a clipping rect for the text area
         clip_rect = pygame.Rect(self.rect.x + 12, self.rect.y + 12,
                                 self.rect.width - 24, self.rect.height - 24)
-        screen.set_clip(clip_rect)
+        # Respect an outer clip (partial redraws of dirty regions)
+        old_clip = screen.get_clip()
+        screen.set_clip(clip_rect.clip(old_clip))
 
         # Draw text with scroll offset
         screen.blit(text_surface, (self.rect.x + 12 -
@@ -316,7 +1496,25 @@ class InputBox:
             pygame.draw.rect(screen, TEXT_COLOR, (cursor_x, cursor_y, 3, 20))
 
         # Reset clipping
-        screen.set_clip(None)
+        screen.set_clip(old_clip)
+
+    @staticmethod
+    def paint(surface, active):
+        """Paint the input box frame at the origin"""
+        rect = surface.get_rect()
+
+        # Draw input box with pixel style
+        surface.fill(ACCENT_COLOR if active else WHITE_COLOR)
+
+        # Thick border
+        border_color = ACCENT_COLOR if active else BORDER_COLOR
+        pygame.draw.rect(surface, border_color, rect, 4)
+
+        # Inner shadow for inset effect
+        pygame.draw.line(surface, SHADOW_COLOR, (4, 4),
+                         (rect.right - 4, 4), 2)
+        pygame.draw.line(surface, SHADOW_COLOR, (4, 4),
+                         (4, rect.bottom - 4), 2)
 
     def get_text(self):
         return self.text
@@ -330,7 +1528,12 @@ class InputBox:
 class TodoApp:
     """Main application class"""
 
-    def __init__(self):
+    def __init__(self, storage=None, sync=True,
+                 journal_path=DEFAULT_JOURNAL_PATH):
+        # Initialize Pygame
+        pygame.init()
+        startup_timeline.mark('pygame init')
+
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Pokemon Todo List")
         self.clock = pygame.time.Clock()
@@ -361,20 +1564,18 @@ class TodoApp:
             print(f"⚠ Could not load icon: {e}")
 
         # Load Pokemon sprites
-        try:
-            pikachu_path = os.path.join(base_dir, 'sprites', 'pikachu.png')
-            pokeball_path = os.path.join(base_dir, 'sprites', 'pokeball.png')
-            badge_path = os.path.join(base_dir, 'sprites', 'badge.png')
-
-            self.pikachu_sprite = pygame.image.load(pikachu_path)
-            self.pokeball_sprite = pygame.image.load(pokeball_path)
-            self.badge_sprite = pygame.image.load(badge_path)
+        self.sprites = SpriteAtlas(
+            os.path.join(base_dir, 'sprites', 'atlas.png'),
+            os.path.join(base_dir, 'sprites', 'atlas.json'))
+        if self.sprites.missing:
+            print(f"⚠ Drawing sprites missing from the atlas: "
+                  f"{', '.join(self.sprites.missing)}")
+        else:
             print("✓ Loaded Pokemon sprites!")
-        except Exception as e:
-            print(f"⚠ Could not load sprites: {e}")
-            self.pikachu_sprite = None
-            self.pokeball_sprite = None
-            self.badge_sprite = None
+        self.pikachu_sprite = self.sprites.get('pikachu')
+        self.pokeball_sprite = self.sprites.get('pokeball')
+        self.badge_sprite = self.sprites.get('badge')
+        startup_timeline.mark('fonts and sprites')
 
         # App state
         self.current_view = 'categories'  # 'categories' or 'tasks'
@@ -383,10 +1584,11 @@ class TodoApp:
         # For edit mode: {'type': 'category'/'task', 'id': ...}
         self.editing_item = None
         self.edit_input = InputBox(150, 300, 500, 50, '')
-        # For confirmation mode: {'action': 'delete_category'/'delete_task'/'edit_category'/'edit_task'/'toggle_task', 'data': ...}
+        # For confirmation mode: {'action': 'delete_category'/'delete_task'/'edit_category'/'edit_task'/'toggle_task'/'delete_selected', 'data': ...}
         self.confirming_action = None
         # For viewing full task text
         self.viewing_task = None
+        self.view_scroll = 0  # First visible line of the task text
 
         # Scrolling
         self.category_scroll = 0
@@ -396,6 +1598,22 @@ class TodoApp:
         # Filter state
         self.show_only_undone = False
 
+        # Selection mode for bulk complete/reopen/delete
+        self.selecting = False
+        self.selection = TaskSelection()
+        # Modifier keys as of the event being handled, not as of now
+        self.key_mods = pygame.KMOD_NONE
+
+        # Search across all categories
+        self.search_index = None  # SearchIndex once built
+        self.search_log = None  # Changes to replay while a build runs
+        self.search_query = None  # Generator of the running search
+        self.search_text = None
+        self.search_version = None
+        self.search_results = []
+        self.search_more = False  # Hit SEARCH_LIMIT
+        self.search_scroll = 0
+
         # New task pulse effect
         self.new_task_id = None
         self.new_task_start_time = 0
@@ -404,6 +1622,7 @@ class TodoApp:
         # Input boxes
         self.category_input = InputBox(150, 510, 400, 50, 'New Goal...')
         self.task_input = InputBox(150, 510, 400, 50, 'New Task...')
+        self.search_input = InputBox(80, 510, 640, 50, 'Search tasks...')
 
         # Buttons
         self.back_button = Button(
@@ -412,40 +1631,517 @@ class TodoApp:
             570, 510, 180, 50, '+ ADD', GREEN_COLOR, WHITE_COLOR)
         self.add_task_button = Button(
             570, 510, 180, 50, '+ ADD', GREEN_COLOR, WHITE_COLOR)
-
-        # Load data
-        self.categories = []
-        self.tasks = []
+        self.select_button = Button(
+            640, 20, 140, 50, 'SELECT', ACCENT_COLOR, TEXT_COLOR)
+        self.search_button = Button(
+            20, 510, 110, 50, 'FIND', BLUE_COLOR, WHITE_COLOR)
+
+        # Selection mode bar, shown instead of the task input
+        self.select_all_button = Button(
+            80, 510, 150, 50, 'ALL', BLUE_COLOR, WHITE_COLOR)
+        self.complete_selected_button = Button(
+            250, 510, 150, 50, 'DONE', GREEN_COLOR, WHITE_COLOR)
+        self.reopen_selected_button = Button(
+            420, 510, 150, 50, 'UNDO', (150, 120, 200), WHITE_COLOR)
+        self.delete_selected_button = Button(
+            590, 510, 150, 50, 'DELETE', RED_COLOR, WHITE_COLOR)
+        self.selection_bar_buttons = [
+            self.select_all_button, self.complete_selected_button,
+            self.reopen_selected_button, self.delete_selected_button]
+
+        # Cards and card buttons drawn by the last frame
+        self.hit_map = HitMap()
+        self.mouse_pos = (0, 0)
+
+        # Dialog widgets, created once and shared by every dialog
+        self.confirm_dialog_rect = pygame.Rect(200, 230, 400, 180)
+        self.yes_button = Button(
+            250, 340, 120, 50, 'YES', GREEN_COLOR, WHITE_COLOR)
+        self.no_button = Button(
+            430, 340, 120, 50, 'NO', RED_COLOR, WHITE_COLOR)
+        self.close_button = Button(
+            325, 390, 150, 45, 'CLOSE', RED_COLOR, WHITE_COLOR)
+        self.dim_overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.dim_overlay.set_alpha(128)
+        self.dim_overlay.fill((0, 0, 0))
+        # The dimmed view behind an open dialog, drawn when it opens
+        self.modal_background = None
+
+        # Database commands run on a background thread
+        self.storage = storage
+        self.storage_error = None
+        self.connecting = False  # A connection attempt is queued
+        self.connect_failures = 0
+        self.reconnect_at = 0  # Ticks before which no automatic reconnect
+        self.refreshing = False  # A refresh's category load is queued
+        self.refresh_queued = False  # Refresh again once it is done
+        self.storage_worker = StorageWorker(notify=self._wake_main_loop)
+        # Writes are coalesced and journaled, then flushed in batches
+        self.write_behind = WriteBehind(journal_path)
+        self.write_flush_at = None  # Ticks when the next flush is due
+        self.write_failures = 0
+
+        # Dirty-region rendering state
+        self.full_redraw = True
+        self.dirty_rects = []
+        self.list_area_rect = pygame.Rect(80, 135, 684, 375)
+
+        # Frame profiler overlay (F3 toggles, F4 dumps frames to a file)
+        self.profiler = FrameProfiler()
+        self.show_profiler = False
+        self.profiler_rect = pygame.Rect(SCREEN_WIDTH - 262, 6, 256, 126)
+        self.profiler_surface = pygame.Surface(
+            self.profiler_rect.size, pygame.SRCALPHA)
+        self.profiler_drawn_at = 0
+        self.dialog_area_rect = pygame.Rect(100, 200, 604, 254)
+
+        # Load data (in-memory model, updated with deltas after writes)
+        self.categories = DocumentList()
+        self.task_views = TaskViews(None)
+        self.tasks = self.task_views.window()
+        # Progress counts per category: {category_id: [total, completed]}
+        self.task_counts = {}
+        self.loading = True
+        # Follows other instances' edits (see start_sync)
+        self.sync = sync
+        self.change_feed = None
+        if self.storage is None:
+            # Connect in the background so the window shows up at once
+            self.connect_storage()
+        else:
+            startup_timeline.mark('db connect')
+            self.start_sync(self.storage)
+        if self.write_behind.recovered:
+            # Flushed ahead of the loads below
+            print(f"⚠ Saving {self.write_behind.recovered} edits "
+                  f"left unsaved by the last run")
         self.load_categories()
+        self.build_search_index()
+
+    @staticmethod
+    def _wake_main_loop():
+        # Runs on the storage worker thread; SDL's event queue is thread-safe
+        try:
+            pygame.event.post(pygame.event.Event(STORAGE_EVENT))
+        except pygame.error:
+            pass
+
+    def connect_storage(self):
+        """Open the storage backend on the worker thread, unless an
+        attempt is already queued"""
+        if self.connecting:
+            return
+        self.connecting = True
+        self.storage_error = None
+        self.storage_worker.submit(
+            self._open_storage, on_done=self._storage_connected,
+            on_error=self._storage_failed)
+
+    def _open_storage(self):
+        # Runs on the worker thread. Assigning here (not in the callback)
+        # lets the commands queued behind the connection use it.
+        self.storage = open_replica()
+        self.start_sync(self.storage)
+        return self.storage
+
+    def start_sync(self, storage):
+        """Start following other instances' changes to shared storage
+
+        Started before the initial loads run, so no change falls between
+        a load and the start of the feed.
+        """
+        if self.sync and storage.supports_sync and self.change_feed is None:
+            self.change_feed = storage.change_feed(
+                lambda changes: self.storage_worker.post(
+                    self.apply_remote_changes, changes))
+            self.change_feed.start()
+
+    def apply_remote_changes(self, changes):
+        """Apply changes from the change feed to the loaded views, the
+        progress counts and the search index
+
+        The feed also returns this instance's own writes, so every change
+        is compared with local state first and applying it twice is a
+        no-op. What cannot be derived locally (counts before the search
+        index is built, tasks outside the loaded window) is reloaded once
+        for the whole batch.
+        """
+        reload = {'counts': False, 'tasks': False}
+        for change in changes:
+            if change[0] == 'reload':
+                self.refresh()
+                return
+            kind, collection, value = change
+            if collection == 'categories':
+                if kind == 'upsert':
+                    self._apply_remote_category(value)
+                else:
+                    self._apply_remote_category_delete(value)
+            elif kind == 'upsert':
+                self._apply_remote_task(value, reload)
+            else:
+                self._apply_remote_task_delete(value, reload)
+        if reload['counts']:
+            self.load_categories()
+        if reload['tasks'] and self.selected_category_id is not None:
+            self.load_tasks(self.selected_category_id)
+
+    def _apply_remote_category(self, doc):
+        category = {key: doc[key] for key in ('_id', 'name', 'created_at')}
+        self.categories.insert(category)
+        if self.selected_category_id == category['_id']:
+            self.selected_category_name = category['name']
+
+    def _apply_remote_category_delete(self, selector):
+        for category_id in selector['ids']:
+            if category_id not in self.categories:
+                continue
+            self.categories.remove(category_id)
+            self.task_counts.pop(category_id, None)
+            self._index('remove_selected', {'category_id': category_id})
+            if self.selected_category_id == category_id:
+                # The open category is gone
+                self.current_view = 'categories'
+                self.selected_category_id = None
+                self.set_selecting(False)
+        self.category_scroll = min(
+            self.category_scroll,
+            max(0, len(self.categories) - self.items_per_page))
+
+    def _open_views(self, category_id):
+        """The task windows if they show this category, else None"""
+        if self.selected_category_id == category_id and \
+                self.task_views.category_id == category_id:
+            return self.task_views
+        return None
+
+    def _apply_remote_task(self, doc, reload):
+        task = {key: doc[key] for key in
+                ('_id', 'category_id', 'name', 'completed', 'created_at')}
+        task_id = task['_id']
+        views = self._open_views(task['category_id'])
+
+        # The search index knows every task, the windows the loaded ones
+        entry = self.search_index.get(task_id) if self.search_index else None
+        if entry is not None:
+            previous = {'name': entry[2], 'completed': entry[3]}
+        elif views is not None and task_id in views:
+            previous = dict(views.get(task_id))
+        else:
+            previous = None
+        known = previous is not None or self.search_index is not None
+
+        if not known:
+            reload['counts'] = True
+        elif previous is None:
+            self._adjust_task_counts(task['category_id'], total=1,
+                                     completed=int(task['completed']))
+        elif previous['completed'] != task['completed']:
+            self._adjust_task_counts(
+                task['category_id'],
+                completed=1 if task['completed'] else -1)
+
+        if views is not None:
+            if previous is not None:
+                # Patched where loaded, inserted where it joins a filter
+                views.patch_many(
+                    [dict(task, **previous)],
+                    {'name': task['name'], 'completed': task['completed']})
+            elif not known:
+                reload['tasks'] = True
+            else:
+                views.insert(task)
+
+        if previous is None:
+            self._index('add', task)
+        else:
+            if previous['name'] != task['name']:
+                self._index('rename', task_id, task['name'])
+            if previous['completed'] != task['completed']:
+                self._index('set_completed', task_id, task['completed'])
+
+    def _apply_remote_task_delete(self, selector, reload):
+        views = self.task_views
+        if self.search_index is not None:
+            entries = self.search_index.selected(selector)
+            for _, category_id, _, completed in entries:
+                self._adjust_task_counts(category_id, total=-1,
+                                         completed=-int(completed))
+            shown = [entry[0] for entry in entries
+                     if entry[1] == views.category_id]
+        else:
+            reload['counts'] = True
+            shown = selector.get('ids', [])
+            if selector.get('category_id') == views.category_id:
+                reload['tasks'] = True
+        self._index('remove_selected', selector)
+
+        loaded = [views.get(task_id) for task_id in shown
+                  if task_id in views]
+        if len(loaded) < len(shown) and not views.complete:
+            # Tasks outside the loaded pages may shift the windows
+            reload['tasks'] = True
+        views.remove_many(loaded)
+
+    def _storage_connected(self, storage):
+        self.connecting = False
+        self.connect_failures = 0
+        startup_timeline.mark('db connect')
+        print(f"✓ Connected to {storage.name} successfully!")
+
+    def _storage_failed(self, error):
+        self.connecting = False
+        self.connect_failures += 1
+        self.reconnect_at = pygame.time.get_ticks() + backoff_ms(
+            RECONNECT_MS, self.connect_failures)
+        self.storage_error = str(error)
+        print(f"✗ Failed to open storage: {error}")
+        print("Make sure MongoDB is running on mongodb://localhost:27017/")
+        print("or set TODO_STORAGE=sqlite to use a local database file")
+
+    def _submit(self, method, *args, on_done=None, on_error=None, **kwargs):
+        """Queue a call of a storage method on the worker thread
+
+        Pending writes are flushed first, so reads see every local edit.
+        """
+        if self.write_behind.pending:
+            self.flush_writes()
+
+        def call():
+            if self.storage is None:
+                raise ConnectionError('storage is not connected')
+            return getattr(self.storage, method)(*args, **kwargs)
+        self.storage_worker.submit(call, on_done=on_done, on_error=on_error)
 
     def load_categories(self):
-        """Load categories from database"""
-        self.categories = list(
-            categories_collection.find().sort('created_at', -1))
+        """Load categories from database in the background"""
+        self.categories.begin_load()
+        self._submit('load_categories', on_done=self._set_categories,
+                     on_error=self._categories_failed)
+
+    def _categories_failed(self, error):
+        self.categories.cancel_load()
+        print(f"✗ Database error: {error}")
+        self._refreshed()
+
+    def _set_categories(self, categories):
+        # Progress counts come with the categories (see storage COUNTERS)
+        self.task_counts = {
+            category['_id']: [category.pop('task_count', 0),
+                              category.pop('completed_count', 0)]
+            for category in categories}
+        self.categories.reset(categories)
+        self.loading = False
+        startup_timeline.mark('first data')
+        self._report_startup()
+        self._refreshed()
+
+    def _report_startup(self):
+        if (startup_timeline.has('first data')
+                and startup_timeline.has('first frame')
+                and not startup_timeline.has('ready')):
+            startup_timeline.mark('ready')
+            print(f"✓ Startup: {startup_timeline.summary()}")
 
     def load_tasks(self, category_id):
-        """Load tasks for a specific category"""
-        self.tasks = list(tasks_collection.find(
-            {'category_id': category_id}).sort('created_at', -1))
+        """Open a paged window over a category's tasks at the scroll position"""
+        self.task_views = TaskViews(category_id, fetch=self._fetch_task_page)
+        self.show_task_filter()
+
+    def show_task_filter(self):
+        """Show the open category's window for the current filter"""
+        self.tasks = self.task_views.window(
+            False if self.show_only_undone else None)
+        self.tasks.ensure_range(
+            self.task_scroll, self.task_scroll + self.items_per_page)
+
+    def _fetch_task_page(self, window, direction, key, skip):
+        """Queue one page load for a task window"""
+        self._submit(
+            'load_tasks_page', window.category_id,
+            after=key if direction == 'next' else None,
+            before=key if direction == 'prev' else None,
+            skip=skip, limit=window.PAGE_SIZE, completed=window.completed,
+            on_done=lambda page: self._task_page_loaded(
+                window, direction, skip, page),
+            on_error=lambda error: self._task_page_failed(
+                window, direction, error))
+
+    def _task_page_loaded(self, window, direction, skip, page):
+        window.page_loaded(direction, skip, page)
+        # Ignore pages for a category the user already left
+        if window is self.tasks:
+            window.ensure_range(
+                self.task_scroll, self.task_scroll + self.items_per_page)
+
+    def _task_page_failed(self, window, direction, error):
+        window.page_failed(direction)
+        print(f"✗ Database error: {error}")
+
+    def task_total(self):
+        """Number of tasks in the current (filtered) task list"""
+        return self.tasks.total(
+            self.get_task_counts(self.selected_category_id))
+
+    def refresh(self, force=True):
+        """Reload everything from the database to reconcile local state
+
+        Without force, a failed connection is only retried once its
+        backoff has passed.
+        """
+        if self.storage is None and (
+                force or pygame.time.get_ticks() >= self.reconnect_at):
+            # The last connection attempt failed, try again
+            self.connect_storage()
+        if self.storage is None and not self.connecting:
+            return  # Nothing to reload from yet
+        self.refreshing = True
+        self.load_categories()
+        if self.search_log is None:
+            self.build_search_index()
+        if self.selected_category_id is not None:
+            self.load_tasks(self.selected_category_id)
+
+    def _refreshed(self):
+        # The category load queued by refresh() (or any other) finished
+        self.refreshing = False
+        if self.refresh_queued:
+            self.refresh_queued = False
+            self.refresh(force=False)
+
+    def _on_storage_error(self, error):
+        """Storage refused some writes: drop their optimistic changes by
+        reloading
+
+        A refresh already queued may replay edits made after it started
+        on top of what it loads, so another one follows it instead of
+        piling up one per failure.
+        """
+        print(f"✗ Database error: {error}")
+        if self.refreshing:
+            self.refresh_queued = True
+        else:
+            self.refresh(force=False)
+
+    def _write(self, method, *args):
+        """Queue a database write, flushed with the edits that follow it
+        within WRITE_BEHIND_MS"""
+        self.write_behind.add(method, *args)
+        if self.write_flush_at is None:
+            self.write_flush_at = pygame.time.get_ticks() + WRITE_BEHIND_MS
+
+    def flush_writes(self):
+        """Send every pending write to storage as one ordered batch"""
+        self.write_flush_at = None
+        if not self.write_behind.pending:
+            return
+
+        def flush():
+            if self.storage is None:
+                raise ConnectionError('storage is not connected')
+            return self.write_behind.flush(self.storage.apply_writes)
+        self.storage_worker.submit(flush, on_done=self._writes_flushed,
+                                   on_error=self._writes_failed)
+
+    def _writes_flushed(self, count):
+        if self.write_failures and count:
+            print(f"✓ Saved {count} pending edits")
+            self.write_failures = 0
+
+    def _writes_failed(self, error):
+        if isinstance(error, WriteRejected):
+            # Retrying cannot help: drop the edits and reload
+            self._on_storage_error(error)
+            return
+        # The edits stay queued (and journaled) until a flush succeeds,
+        # marked NOT SAVED in the subtitles meanwhile
+        if not self.write_failures:
+            print(f"✗ Saving edits failed, retrying: {error}")
+        self.write_failures += 1
+        ticks = pygame.time.get_ticks()
+        self.write_flush_at = ticks + backoff_ms(
+            WRITE_RETRY_MS, self.write_failures)
+        if self.storage is None and ticks >= self.reconnect_at:
+            self.connect_storage()
+
+    def build_search_index(self):
+        """Index every task for search on the worker thread
+
+        Each step reads batches of tasks for up to SEARCH_BUILD_MS, then
+        queues the next step behind the commands submitted meanwhile, so
+        page loads and writes are not held up by the whole build.
+        """
+        self.flush_writes()
+        self.search_log = []
+        index = SearchIndex()
+
+        def step(after):
+            if self.storage is None:
+                raise ConnectionError('storage is not connected')
+            deadline = time.perf_counter() + SEARCH_BUILD_MS / 1000
+            while True:
+                batch = self.storage.tasks_after(after, SEARCH_BUILD_BATCH)
+                index.extend(batch)
+                if len(batch) < SEARCH_BUILD_BATCH:
+                    index.sort_vocabulary()
+                    self.storage_worker.post(self._search_index_built,
+                                             index)
+                    return
+                after = batch[-1]['_id']
+                if time.perf_counter() >= deadline:
+                    self.storage_worker.submit(
+                        step, after, on_error=self._search_index_failed)
+                    return
+        self.storage_worker.submit(step, None,
+                                   on_error=self._search_index_failed)
+
+    def _search_index_built(self, index):
+        # Changes made while the build ran may be missing from the
+        # batches read before them; replaying one already read is a no-op
+        for method, args in self.search_log:
+            getattr(index, method)(*args)
+        self.search_index = index
+        self.search_log = None
+
+    def _search_index_failed(self, error):
+        self.search_log = None
+        print(f"⚠ Search index not built: {error}")
+
+    def _index(self, method, *args):
+        """Apply a local change to the search index"""
+        if self.search_index is not None:
+            getattr(self.search_index, method)(*args)
+        if self.search_log is not None:
+            self.search_log.append((method, args))
+
+    def get_task_counts(self, category_id):
+        """Return (total, completed) for a category from the cache"""
+        counts = self.task_counts.get(category_id)
+        return (counts[0], counts[1]) if counts else (0, 0)
+
+    def _adjust_task_counts(self, category_id, total=0, completed=0):
+        """Apply a delta to the cached progress counts of a category"""
+        counts = self.task_counts.setdefault(category_id, [0, 0])
+        counts[0] = max(0, counts[0] + total)
+        counts[1] = max(0, counts[1] + completed)
 
     def add_category(self, name):
         """Add a new category"""
         if name.strip():
             category = {
+                '_id': ObjectId(),
                 'name': name,
-                'created_at': datetime.now()
+                'created_at': now()
             }
-            categories_collection.insert_one(category)
-            self.load_categories()
+            self.categories.insert(category)
+            self._write('insert_category', dict(category))
 
     def update_category(self, category_id, new_name):
         """Update a category name"""
         if new_name.strip():
-            categories_collection.update_one(
-                {'_id': category_id},
-                {'$set': {'name': new_name}}
-            )
-            self.load_categories()
+            self.categories.patch(category_id, {'name': new_name})
+            self._write('update_category',
+                        category_id, {'name': new_name})
             if self.selected_category_id == category_id:
                 self.selected_category_name = new_name
 
@@ -453,99 +2149,391 @@ class TodoApp:
         """Add a new task to a category"""
         if name.strip():
             task = {
+                '_id': ObjectId(),
                 'category_id': category_id,
                 'name': name,
                 'completed': False,
-                'created_at': datetime.now()
+                'created_at': now()
             }
-            result = tasks_collection.insert_one(task)
+            if category_id == self.selected_category_id:
+                self.task_views.insert(task)
+            self._adjust_task_counts(category_id, total=1)
+            self._index('add', dict(task))
+            self._write('insert_task', dict(task))
             # Track new task for pulse effect
-            self.new_task_id = result.inserted_id
+            self.new_task_id = task['_id']
             self.new_task_start_time = pygame.time.get_ticks()
-            self.load_tasks(category_id)
 
     def update_task(self, task_id, new_name):
         """Update a task name"""
         if new_name.strip():
-            tasks_collection.update_one(
-                {'_id': task_id},
-                {'$set': {'name': new_name}}
-            )
-            self.load_tasks(self.selected_category_id)
+            self.task_views.patch(task_id, {'name': new_name})
+            self._index('rename', task_id, new_name)
+            self._write('update_task', task_id, {'name': new_name})
 
     def toggle_task(self, task_id):
         """Toggle task completion status"""
-        task = tasks_collection.find_one({'_id': task_id})
+        task = self.task_views.get(task_id)
         if task:
             new_status = not task['completed']
-            tasks_collection.update_one(
-                {'_id': task_id},
-                {'$set': {'completed': new_status}}
-            )
-            self.load_tasks(self.selected_category_id)
+            self.task_views.patch(task_id, {'completed': new_status})
+            self._adjust_task_counts(
+                task['category_id'], completed=1 if new_status else -1)
+            self._index('set_completed', task_id, new_status)
+            self._write('update_task',
+                        task_id, {'completed': new_status})
 
     def delete_category(self, category_id):
         """Delete a category and all its tasks"""
-        categories_collection.delete_one({'_id': category_id})
-        tasks_collection.delete_many({'category_id': category_id})
-        self.load_categories()
+        self.categories.remove(category_id)
+        self.task_counts.pop(category_id, None)
+        self._index('remove_selected', {'category_id': category_id})
+        self._write('delete_category', category_id)
 
     def delete_task(self, task_id):
         """Delete a task"""
-        tasks_collection.delete_one({'_id': task_id})
-        self.load_tasks(self.selected_category_id)
+        task = self.task_views.remove(task_id)
+        if task:
+            self._adjust_task_counts(
+                task['category_id'], total=-1,
+                completed=-1 if task['completed'] else 0)
+        self._index('remove', task_id)
+        self._write('delete_task', task_id)
+
+    def set_selecting(self, selecting):
+        """Enter or leave the tasks view's selection mode"""
+        self.selecting = selecting
+        self.selection.clear()
+        self.select_button.text = 'CANCEL' if selecting else 'SELECT'
+        self.task_input.active = False
+
+    def select_task(self, position, task, extend=False):
+        """Toggle a task, or with extend select every task from the last
+        clicked one to this one (tasks in pages not loaded are skipped)"""
+        anchor = self.selection.anchor
+        if extend and anchor is not None:
+            step = 1 if position >= anchor else -1
+            for i in range(anchor, position + step, step):
+                doc = self.tasks.at(i)
+                if doc is not None:
+                    self.selection.set(doc, True)
+        else:
+            self.selection.toggle(task)
+            self.selection.anchor = position
+
+    def apply_to_selection(self, action):
+        """Complete, reopen or delete the selected tasks
+
+        action is 'complete', 'reopen' or 'delete'. All selected tasks are
+        written with one bulk operation, and the loaded windows and cached
+        counts are updated in place.
+        """
+        window = self.tasks
+        selection = self.selection
+        category_id = self.selected_category_id
+        if selection.all:
+            # Every task in the filtered view except the excluded ones
+            excluded = selection.docs
+            count = self.task_total() - len(excluded)
+            if window.completed is None:
+                done = self.get_task_counts(category_id)[1] - sum(
+                    1 for doc in excluded.values() if doc['completed'])
+            else:
+                done = count if window.completed else 0
+            docs = [doc for doc in window if doc['_id'] not in excluded]
+            selector = {'category_id': category_id,
+                        'completed': window.completed,
+                        'exclude': list(excluded)}
+        else:
+            docs = list(selection.docs.values())
+            count = len(docs)
+            done = sum(1 for doc in docs if doc['completed'])
+            selector = {'ids': list(selection.docs)}
+        if count <= 0:
+            return
+
+        if action == 'delete':
+            self.task_views.remove_many(docs)
+            self._adjust_task_counts(
+                category_id, total=-count, completed=-done)
+            self._index('remove_selected', selector)
+            self._write('delete_tasks', selector)
+        else:
+            completed = action == 'complete'
+            self.task_views.patch_many(docs, {'completed': completed})
+            self._adjust_task_counts(
+                category_id, completed=count - done if completed else -done)
+            self._index('update_selected', selector, completed)
+            self._write('update_tasks', selector, {'completed': completed})
+
+        selection.clear()
+        max_scroll = max(0, self.task_total() - self.items_per_page)
+        self.task_scroll = min(self.task_scroll, max_scroll)
+        if 'category_id' in selector and not self.task_views.complete:
+            # Tasks outside the loaded pages changed too: reload the
+            # windows, which runs after the write on the storage worker
+            self.load_tasks(category_id)
+
+    def open_search(self):
+        """Switch to the search view with the search box focused"""
+        self.current_view = 'search'
+        self.set_selecting(False)
+        self.search_input.active = True
+        self.search_text = None  # Rerun the search on the next frame
+
+    def update_search(self):
+        """Start a search when the query or the index changed, and run it
+        for up to SEARCH_BUDGET_MS; returns True if the results changed"""
+        index = self.search_index
+        if self.current_view != 'search' or index is None:
+            # open_search() starts over
+            self.search_query = None
+            return False
+        changed = False
+        if self.search_input.text != self.search_text or \
+                index.version != self.search_version:
+            if self.search_input.text != self.search_text:
+                self.search_scroll = 0
+            self.search_text = self.search_input.text
+            self.search_version = index.version
+            self.search_query = index.search(self.search_text)
+            self.search_results = []
+            self.search_more = False
+            changed = True
+        if self.search_query is None:
+            return changed
+
+        deadline = time.perf_counter() + SEARCH_BUDGET_MS / 1000
+        for entry in self.search_query:
+            if entry is not None:
+                self.search_results.append(entry)
+                changed = True
+                if len(self.search_results) >= SEARCH_LIMIT:
+                    self.search_more = True
+                    self.search_query = None
+                    break
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            self.search_query = None
+        return changed
+
+    def open_search_result(self, entry):
+        """Show a found task in its category's tasks view"""
+        task_id, category_id = entry[0], entry[1]
+        category = self.categories.get(category_id)
+        if category is None:
+            return
+        self.current_view = 'tasks'
+        self.selected_category_id = category_id
+        self.selected_category_name = category['name']
+        self.show_only_undone = False
+        self.task_scroll = 0
+        self.task_views = TaskViews(category_id, fetch=self._fetch_task_page)
+        self.tasks = self.task_views.window()
+        # Hold page loads until the task's position is known
+        self.tasks.pending.add('position')
+        window = self.tasks
+        self._submit('task_position', task_id,
+                     on_done=lambda position: self._show_task_at(
+                         window, task_id, position))
+
+    def _show_task_at(self, window, task_id, position):
+        if window is not self.tasks:
+            return
+        window.pending.discard('position')
+        if position is not None:
+            max_scroll = max(0, self.task_total() - self.items_per_page)
+            self.task_scroll = min(max(0, position - 2), max_scroll)
+            # Point the task out with the new task pulse
+            self.new_task_id = task_id
+            self.new_task_start_time = pygame.time.get_ticks()
+        window.ensure_range(
+            self.task_scroll, self.task_scroll + self.items_per_page)
+
+    # Title box of each view: (rect, color)
+    VIEW_TITLES = {
+        'categories': (pygame.Rect(50, 20, 700, 100), ACCENT_COLOR),
+        'tasks': (pygame.Rect(180, 20, 440, 100), BLUE_COLOR),
+        'search': (pygame.Rect(180, 20, 440, 100), GREEN_COLOR),
+    }
+    SCROLLBAR_RECT = pygame.Rect(748, 155, 10, 315)
+    # Task text in the view dialog
+    VIEW_TEXT_WIDTH = 550
+    VIEW_TEXT_LINES = 6
+    VIEW_SCROLLBAR_RECT = pygame.Rect(682, 262, 8, 116)
+
+    def _list_total(self):
+        """Number of items in the current view's list"""
+        if self.current_view == 'categories':
+            return len(self.categories)
+        if self.current_view == 'search':
+            return len(self.search_results)
+        return self.task_total()
+
+    def _view_chrome(self):
+        """Background, title box and scrollbar track of the current view,
+        painted once per view"""
+        scrollbar = self._list_total() > self.items_per_page
+        title_rect, color = self.VIEW_TITLES[self.current_view]
+        return chrome_cache.get(
+            ('view', self.current_view, scrollbar),
+            (SCREEN_WIDTH, SCREEN_HEIGHT), self._paint_view_chrome,
+            title_rect, color, scrollbar, transparent=False)
+
+    def _paint_view_chrome(self, surface, title_rect, color, scrollbar):
+        surface.fill(BG_COLOR)
+        PixelBox.paint(surface, title_rect, color, 6)
+        if scrollbar:
+            PixelBox.paint_frame(surface, self.SCROLLBAR_RECT, SHADOW_COLOR, 2)
+
+    def draw_scrollbar(self, total, scroll, track=None, page=None):
+        """Draw the scrollbar thumb for a list scrolled to scroll"""
+        track = track or self.SCROLLBAR_RECT
+        page = page or self.items_per_page
+        thumb_height = max(30, int(track.height * page / total))
+        max_scroll = total - page
+        thumb_y = track.y
+        if max_scroll > 0:
+            thumb_y += int((track.height - thumb_height) * scroll / max_scroll)
+        thumb = chrome_cache.get(
+            ('thumb', track.width, thumb_height),
+            (track.width, thumb_height),
+            PixelBox.paint_frame, pygame.Rect(0, 0, track.width, thumb_height),
+            BLUE_COLOR, 2, transparent=False)
+        self.screen.blit(thumb, (track.x, thumb_y))
+
+    def draw_search_view(self):
+        """Draw the search view with results from every category"""
+        self.back_button.draw(self.screen, self.small_font)
+
+        # Title, over the title box of the view chrome
+        title = text_cache.render(
+            self.title_font, 'SEARCH', False, WHITE_COLOR)
+        title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 50))
+        self.screen.blit(title, title_rect)
+
+        # Subtitle with the number of matches or the index state
+        total_results = len(self.search_results)
+        if self.search_index is None:
+            subtitle_text = ('INDEXING...' if self.search_log is not None
+                             else 'SEARCH UNAVAILABLE')
+        elif not self.search_input.text.strip():
+            subtitle_text = 'TYPE TO SEARCH ALL GOALS'
+        elif self.search_more:
+            subtitle_text = f'{total_results}+ MATCHES'
+        elif self.search_query is not None:
+            subtitle_text = f'{total_results} MATCHES...'
+        else:
+            subtitle_text = f'{total_results} MATCHES'
+        subtitle = text_cache.render(
+            self.small_font, subtitle_text, False, WHITE_COLOR)
+        subtitle_rect = subtitle.get_rect(center=(SCREEN_WIDTH // 2, 90))
+        self.screen.blit(subtitle, subtitle_rect)
+
+        max_scroll = max(0, total_results - self.items_per_page)
+        self.search_scroll = min(self.search_scroll, max_scroll)
+
+        # Scrollbar thumb, over the track drawn with the view chrome
+        if total_results > self.items_per_page:
+            self.draw_scrollbar(total_results, self.search_scroll)
+
+        # Scroll indicators
+        if self.search_scroll > 0:
+            up_text = text_cache.render(self.font, '^', False, TEXT_COLOR)
+            self.screen.blit(up_text, (750, 135))
+
+        if self.search_scroll + self.items_per_page < total_results:
+            down_text = text_cache.render(self.font, 'v', False, TEXT_COLOR)
+            self.screen.blit(down_text, (750, 485))
+
+        # Result cards: task name and the goal it belongs to
+        y_offset = 140
+        for entry in self.search_results[
+                self.search_scroll:self.search_scroll + self.items_per_page]:
+            _, category_id, name, completed = entry
+            card_rect = pygame.Rect(80, y_offset, 640, 55)
+            card = self.hit_map.add(
+                card_rect, self.open_search_result, entry)
+            is_hovered = self.hit_map.at(self.mouse_pos) is card
+            if completed:
+                card_color = (200, 240, 200) if is_hovered else (180, 230, 180)
+            else:
+                card_color = (255, 255, 200) if is_hovered else WHITE_COLOR
+            PixelBox.draw(self.screen, card_rect, card_color, 4)
+
+            text_color = (100, 100, 100) if completed else TEXT_COLOR
+            name_text = text_metrics.truncate(self.font, name, 400)
+            text = text_cache.render(self.font, name_text, False, text_color)
+            self.screen.blit(text, (card_rect.x + 15, card_rect.y + 18))
+
+            category = self.categories.get(category_id)
+            category_text = text_metrics.truncate(
+                self.small_font, category['name'] if category else '', 190)
+            text = text_cache.render(
+                self.small_font, category_text, False, BLUE_COLOR)
+            self.screen.blit(text, (card_rect.x + 435, card_rect.y + 21))
+
+            y_offset += 65
+
+        self.search_input.draw(self.screen, self.small_font)
+
+    def handle_search_click(self, pos):
+        """Handle clicks in search view"""
+        if self.back_button.is_clicked(pos):
+            self.current_view = 'categories'
+            self.search_input.active = False
+            return
+
+        # Result cards
+        self.hit_map.click(pos)
 
     def draw_categories_view(self):
         """Draw the categories view"""
-        # Title box with retro style
-        title_box_rect = pygame.Rect(50, 20, 700, 100)
-        PixelBox.draw(self.screen, title_box_rect, ACCENT_COLOR, 6)
-
         # Title text
-        title = self.title_font.render('POKEMON TODO', False, TEXT_COLOR)
+        title = text_cache.render(
+            self.title_font, 'POKEMON TODO', False, TEXT_COLOR)
         title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 50))
         self.screen.blit(title, title_rect)
 
         # Subtitle with count
         total_categories = len(self.categories)
         subtitle_text = f'SELECT A GOAL ({total_categories})'
-        subtitle = self.small_font.render(subtitle_text, False, TEXT_COLOR)
+        if self.write_failures:
+            subtitle_text += ' - NOT SAVED'
+        subtitle = text_cache.render(
+            self.small_font, subtitle_text, False, TEXT_COLOR)
         subtitle_rect = subtitle.get_rect(center=(SCREEN_WIDTH // 2, 90))
         self.screen.blit(subtitle, subtitle_rect)
 
-        # Draw scrollbar if there are more items than can fit
+        # Startup and connection status while there is nothing to show
+        if not self.categories:
+            if self.storage_error:
+                status_lines = ['DATABASE UNAVAILABLE', 'PRESS F5 TO RETRY']
+            elif self.loading:
+                status_lines = ['LOADING...']
+            else:
+                status_lines = []
+            for i, line in enumerate(status_lines):
+                status = text_cache.render(
+                    self.small_font, line, False, TEXT_COLOR)
+                status_rect = status.get_rect(
+                    center=(SCREEN_WIDTH // 2, 250 + i * 30))
+                self.screen.blit(status, status_rect)
+
+        # Scrollbar thumb, over the track drawn with the view chrome
         if total_categories > self.items_per_page:
-            scrollbar_x = 748
-            scrollbar_y = 155
-            scrollbar_width = 10
-            scrollbar_height = 315  # Total scrollable area height
-
-            # Scrollbar track
-            track_rect = pygame.Rect(
-                scrollbar_x, scrollbar_y, scrollbar_width, scrollbar_height)
-            pygame.draw.rect(self.screen, SHADOW_COLOR, track_rect)
-            pygame.draw.rect(self.screen, BORDER_COLOR, track_rect, 2)
-
-            # Scrollbar thumb
-            thumb_height = max(
-                30, int(scrollbar_height * self.items_per_page / total_categories))
-            max_scroll = total_categories - self.items_per_page
-            thumb_y = scrollbar_y + int((scrollbar_height - thumb_height) * (
-                self.category_scroll / max_scroll)) if max_scroll > 0 else scrollbar_y
-            thumb_rect = pygame.Rect(
-                scrollbar_x, thumb_y, scrollbar_width, thumb_height)
-            pygame.draw.rect(self.screen, BLUE_COLOR, thumb_rect)
-            pygame.draw.rect(self.screen, BORDER_COLOR, thumb_rect, 2)
+            self.draw_scrollbar(total_categories, self.category_scroll)
 
         # Scroll indicators
         if self.category_scroll > 0:
             # Up arrow
-            up_text = self.font.render('^', False, TEXT_COLOR)
+            up_text = text_cache.render(self.font, '^', False, TEXT_COLOR)
             self.screen.blit(up_text, (750, 135))
 
         if self.category_scroll + self.items_per_page < total_categories:
             # Down arrow
-            down_text = self.font.render('v', False, TEXT_COLOR)
+            down_text = text_cache.render(self.font, 'v', False, TEXT_COLOR)
             self.screen.blit(down_text, (750, 485))
 
         # Draw categories with scrolling
@@ -558,49 +2546,43 @@ class TodoApp:
             # Category card with thick pixel borders
             card_rect = pygame.Rect(80, y_offset, 640, 55)
 
-            # Check hover
-            mouse_pos = pygame.mouse.get_pos()
+            # Register the card and its buttons, the card is hovered
+            # unless the mouse is over one of its buttons
             edit_btn_rect = pygame.Rect(
                 card_rect.right - 105, card_rect.y + 10, 45, 35)
             delete_btn_rect = pygame.Rect(
                 card_rect.right - 55, card_rect.y + 10, 45, 35)
-            is_hovered = card_rect.collidepoint(mouse_pos) and not delete_btn_rect.collidepoint(
-                mouse_pos) and not edit_btn_rect.collidepoint(mouse_pos)
+            card = self.hit_map.add(card_rect, self.open_category, category)
+            self.hit_map.add(
+                edit_btn_rect, self.confirm_item, 'edit_category', category)
+            self.hit_map.add(
+                delete_btn_rect, self.confirm_item, 'delete_category',
+                category)
+            is_hovered = self.hit_map.at(self.mouse_pos) is card
 
             # Draw card with pixel box
             card_color = (255, 255, 200) if is_hovered else WHITE_COLOR
             PixelBox.draw(self.screen, card_rect, card_color, 4)
 
             # Pokeball icon
-            if self.pokeball_sprite:
-                self.screen.blit(self.pokeball_sprite,
-                                 (card_rect.x + 10, card_rect.y + 12))
-                text_x = card_rect.x + 50
-            else:
-                text_x = card_rect.x + 15
+            self.screen.blit(self.pokeball_sprite,
+                             (card_rect.x + 10, card_rect.y + 12))
+            text_x = card_rect.x + 50
 
             # Category name with smart truncation
             name_text = category['name']
             max_text_width = 280  # Space before badge
 
-            # Try to fit the full text, if not truncate with ...
-            test_surface = self.font.render(name_text, False, TEXT_COLOR)
-            if test_surface.get_width() > max_text_width:
-                # Truncate and add ...
-                while len(name_text) > 0 and self.font.render(name_text + '...', False, TEXT_COLOR).get_width() > max_text_width:
-                    name_text = name_text[:-1]
-                name_text += '...'
+            # Fit the full text, if not truncate with ...
+            name_text = text_metrics.truncate(
+                self.font, name_text, max_text_width)
 
-            text = self.font.render(name_text, False, TEXT_COLOR)
+            text = text_cache.render(self.font, name_text, False, TEXT_COLOR)
             self.screen.blit(text, (text_x, card_rect.y + 18))
 
-            # Task count with pixelated badge
-            task_count = tasks_collection.count_documents(
-                {'category_id': category['_id']})
-            completed_count = tasks_collection.count_documents({
-                'category_id': category['_id'],
-                'completed': True
-            })
+            # Task count with pixelated badge (served from the count cache)
+            task_count, completed_count = self.get_task_counts(
+                category['_id'])
 
             # Progress badge with badge sprite
             badge_rect = pygame.Rect(
@@ -609,7 +2591,8 @@ class TodoApp:
             pygame.draw.rect(self.screen, badge_color, badge_rect)
             pygame.draw.rect(self.screen, BORDER_COLOR, badge_rect, 3)
 
-            count_text = self.small_font.render(
+            count_text = text_cache.render(
+                self.small_font,
                 f'{completed_count}/{task_count}',
                 False,
                 WHITE_COLOR
@@ -620,41 +2603,42 @@ class TodoApp:
             # Edit button
             pygame.draw.rect(self.screen, BLUE_COLOR, edit_btn_rect)
             pygame.draw.rect(self.screen, BORDER_COLOR, edit_btn_rect, 3)
-            edit_text = self.small_font.render('E', False, WHITE_COLOR)
+            edit_text = text_cache.render(
+                self.small_font, 'E', False, WHITE_COLOR)
             edit_text_rect = edit_text.get_rect(center=edit_btn_rect.center)
             self.screen.blit(edit_text, edit_text_rect)
 
             # Delete button with X
             pygame.draw.rect(self.screen, RED_COLOR, delete_btn_rect)
             pygame.draw.rect(self.screen, BORDER_COLOR, delete_btn_rect, 3)
-            delete_text = self.font.render('X', False, WHITE_COLOR)
+            delete_text = text_cache.render(self.font, 'X', False, WHITE_COLOR)
             delete_text_rect = delete_text.get_rect(
                 center=delete_btn_rect.center)
             self.screen.blit(delete_text, delete_text_rect)
 
             y_offset += 65
 
-        # Input box and button
+        # Input box and buttons
         self.category_input.draw(self.screen, self.small_font)
         self.add_category_button.draw(self.screen, self.small_font)
+        self.search_button.draw(self.screen, self.small_font)
 
     def draw_tasks_view(self):
         """Draw the tasks view for a specific category"""
-        # Back button
+        # Back and selection mode buttons
         self.back_button.draw(self.screen, self.small_font)
-
-        # Title box with retro style
-        title_box_rect = pygame.Rect(180, 20, 440, 100)
-        PixelBox.draw(self.screen, title_box_rect, BLUE_COLOR, 6)
+        self.select_button.draw(self.screen, self.small_font)
 
         # Category name (truncated)
         title_text = self.selected_category_name[:18]
-        title = self.title_font.render(title_text, False, WHITE_COLOR)
+        title = text_cache.render(
+            self.title_font, title_text, False, WHITE_COLOR)
         title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 50))
         self.screen.blit(title, title_rect)
 
         # Filter checkbox and label
         filter_checkbox_rect = pygame.Rect(200, 130, 24, 24)
+        self.hit_map.add(filter_checkbox_rect, self.toggle_undone_filter)
         pygame.draw.rect(self.screen, WHITE_COLOR, filter_checkbox_rect)
         pygame.draw.rect(self.screen, BORDER_COLOR, filter_checkbox_rect, 3)
 
@@ -670,81 +2654,86 @@ class TodoApp:
                              (filter_checkbox_rect.x + 20, filter_checkbox_rect.y + 4), 4)
 
         # Filter label (centered vertically with checkbox)
-        filter_label = self.small_font.render(
-            'Show only undone', False, TEXT_COLOR)
+        filter_label = text_cache.render(
+            self.small_font, 'Show only undone', False, TEXT_COLOR)
         label_y = filter_checkbox_rect.centery - filter_label.get_height() // 2
         self.screen.blit(filter_label, (235, label_y))
 
-        # Get filtered tasks
-        if self.show_only_undone:
-            filtered_tasks = [
-                task for task in self.tasks if not task['completed']]
-        else:
-            filtered_tasks = self.tasks
-
-        total_tasks = len(filtered_tasks)
+        # The task window already holds only filtered tasks
+        total_tasks = self.task_total()
 
         # Subtitle with count
-        subtitle_text = f'TASKS ({total_tasks})'
-        subtitle = self.small_font.render(subtitle_text, False, WHITE_COLOR)
+        if self.selecting:
+            selected = self.selection.count(total_tasks)
+            subtitle_text = f'{selected} OF {total_tasks} SELECTED'
+        else:
+            subtitle_text = f'TASKS ({total_tasks})'
+        if self.write_failures:
+            subtitle_text += ' - NOT SAVED'
+        subtitle = text_cache.render(
+            self.small_font, subtitle_text, False, WHITE_COLOR)
         subtitle_rect = subtitle.get_rect(center=(SCREEN_WIDTH // 2, 90))
         self.screen.blit(subtitle, subtitle_rect)
 
-        # Draw scrollbar if there are more items than can fit
+        # Scrollbar thumb, over the track drawn with the view chrome
         if total_tasks > self.items_per_page:
-            scrollbar_x = 748
-            scrollbar_y = 155
-            scrollbar_width = 10
-            scrollbar_height = 315  # Total scrollable area height
-
-            # Scrollbar track
-            track_rect = pygame.Rect(
-                scrollbar_x, scrollbar_y, scrollbar_width, scrollbar_height)
-            pygame.draw.rect(self.screen, SHADOW_COLOR, track_rect)
-            pygame.draw.rect(self.screen, BORDER_COLOR, track_rect, 2)
-
-            # Scrollbar thumb
-            thumb_height = max(
-                30, int(scrollbar_height * self.items_per_page / total_tasks))
-            max_scroll = total_tasks - self.items_per_page
-            thumb_y = scrollbar_y + int((scrollbar_height - thumb_height) * (
-                self.task_scroll / max_scroll)) if max_scroll > 0 else scrollbar_y
-            thumb_rect = pygame.Rect(
-                scrollbar_x, thumb_y, scrollbar_width, thumb_height)
-            pygame.draw.rect(self.screen, BLUE_COLOR, thumb_rect)
-            pygame.draw.rect(self.screen, BORDER_COLOR, thumb_rect, 2)
+            self.draw_scrollbar(total_tasks, self.task_scroll)
 
         # Scroll indicators
         if self.task_scroll > 0:
             # Up arrow
-            up_text = self.font.render('^', False, TEXT_COLOR)
+            up_text = text_cache.render(self.font, '^', False, TEXT_COLOR)
             self.screen.blit(up_text, (750, 135))
 
         if self.task_scroll + self.items_per_page < total_tasks:
             # Down arrow
-            down_text = self.font.render('v', False, TEXT_COLOR)
+            down_text = text_cache.render(self.font, 'v', False, TEXT_COLOR)
             self.screen.blit(down_text, (750, 485))
 
         # Draw tasks with scrolling
         y_offset = 160
         start_idx = self.task_scroll
         end_idx = min(start_idx + self.items_per_page, total_tasks)
+        self.tasks.ensure_range(start_idx, end_idx)
 
         for i in range(start_idx, end_idx):
-            task = filtered_tasks[i]
+            task = self.tasks.at(i)
             # Task card
             card_rect = pygame.Rect(80, y_offset, 640, 55)
 
-            # Check hover
-            mouse_pos = pygame.mouse.get_pos()
+            if task is None:
+                # Page not loaded yet
+                PixelBox.draw(self.screen, card_rect, WHITE_COLOR, 4)
+                loading_text = text_cache.render(
+                    self.small_font, 'LOADING...', False, (120, 120, 120))
+                self.screen.blit(
+                    loading_text, (card_rect.x + 60, card_rect.y + 22))
+                y_offset += 65
+                continue
+
+            # Register the card and its buttons (the whole card selects
+            # while selecting), the card is hovered unless the mouse is
+            # over one of its buttons
+            checkbox_rect = pygame.Rect(
+                card_rect.x + 15, card_rect.y + 15, 28, 28)
             view_btn_rect = pygame.Rect(
                 card_rect.right - 155, card_rect.y + 10, 45, 35)
             edit_btn_rect = pygame.Rect(
                 card_rect.right - 105, card_rect.y + 10, 45, 35)
             delete_btn_rect = pygame.Rect(
                 card_rect.right - 55, card_rect.y + 10, 45, 35)
-            is_hovered = card_rect.collidepoint(mouse_pos) and not delete_btn_rect.collidepoint(
-                mouse_pos) and not edit_btn_rect.collidepoint(mouse_pos) and not view_btn_rect.collidepoint(mouse_pos)
+            if self.selecting:
+                card = self.hit_map.add(
+                    card_rect, self.select_card, i, task)
+            else:
+                card = self.hit_map.add(card_rect)
+                self.hit_map.add(checkbox_rect, self.toggle_task, task['_id'])
+                self.hit_map.add(view_btn_rect, self.view_task, task)
+                self.hit_map.add(
+                    edit_btn_rect, self.confirm_item, 'edit_task', task)
+                self.hit_map.add(
+                    delete_btn_rect, self.confirm_item, 'delete_task', task)
+            is_hovered = self.hit_map.at(self.mouse_pos) is card
 
             # Check if this is a new task with pulse effect
             is_new_task = False
@@ -764,7 +2753,9 @@ class TodoApp:
                         self.new_task_id = None
 
             # Draw card with pixel box
-            if task['completed']:
+            if self.selecting and task['_id'] in self.selection:
+                card_color = (215, 230, 255) if is_hovered else (190, 210, 250)
+            elif task['completed']:
                 card_color = (200, 240, 200) if is_hovered else (180, 230, 180)
             else:
                 card_color = (255, 255, 200) if is_hovered else WHITE_COLOR
@@ -788,8 +2779,6 @@ class TodoApp:
                 PixelBox.draw(self.screen, card_rect, card_color, 4)
 
             # Checkbox (thick pixel borders)
-            checkbox_rect = pygame.Rect(
-                card_rect.x + 15, card_rect.y + 15, 28, 28)
             pygame.draw.rect(self.screen, WHITE_COLOR, checkbox_rect)
             pygame.draw.rect(self.screen, BORDER_COLOR, checkbox_rect, 4)
 
@@ -808,48 +2797,64 @@ class TodoApp:
             max_text_width = 460  # Space before buttons
             text_color = (100, 100, 100) if task['completed'] else TEXT_COLOR
 
-            # Try to fit the full text, if not truncate with ...
-            test_surface = self.font.render(task_name, False, text_color)
-            if test_surface.get_width() > max_text_width:
-                # Truncate and add ...
-                while len(task_name) > 0 and self.font.render(task_name + '...', False, text_color).get_width() > max_text_width:
-                    task_name = task_name[:-1]
-                task_name += '...'
+            # Fit the full text, if not truncate with ...
+            task_name = text_metrics.truncate(
+                self.font, task_name, max_text_width)
 
-            name_text = self.font.render(task_name, False, text_color)
+            name_text = text_cache.render(
+                self.font, task_name, False, text_color)
             self.screen.blit(name_text, (card_rect.x + 60, card_rect.y + 18))
 
+            if self.selecting:
+                # No per-task buttons while selecting
+                y_offset += 65
+                continue
+
             # View button (eye icon)
             pygame.draw.rect(self.screen, (150, 120, 200),
                              view_btn_rect)  # Purple color
             pygame.draw.rect(self.screen, BORDER_COLOR, view_btn_rect, 3)
-            view_text = self.small_font.render('V', False, WHITE_COLOR)
+            view_text = text_cache.render(
+                self.small_font, 'V', False, WHITE_COLOR)
             view_text_rect = view_text.get_rect(center=view_btn_rect.center)
             self.screen.blit(view_text, view_text_rect)
 
             # Edit button
             pygame.draw.rect(self.screen, BLUE_COLOR, edit_btn_rect)
             pygame.draw.rect(self.screen, BORDER_COLOR, edit_btn_rect, 3)
-            edit_text = self.small_font.render('E', False, WHITE_COLOR)
+            edit_text = text_cache.render(
+                self.small_font, 'E', False, WHITE_COLOR)
             edit_text_rect = edit_text.get_rect(center=edit_btn_rect.center)
             self.screen.blit(edit_text, edit_text_rect)
 
             # Delete button
             pygame.draw.rect(self.screen, RED_COLOR, delete_btn_rect)
             pygame.draw.rect(self.screen, BORDER_COLOR, delete_btn_rect, 3)
-            delete_text = self.font.render('X', False, WHITE_COLOR)
+            delete_text = text_cache.render(self.font, 'X', False, WHITE_COLOR)
             delete_text_rect = delete_text.get_rect(
                 center=delete_btn_rect.center)
             self.screen.blit(delete_text, delete_text_rect)
 
             y_offset += 65
 
+        if self.selecting:
+            # Bulk actions instead of the input box
+            self.select_all_button.text = 'NONE' if (
+                self.selection.all and not self.selection.docs) else 'ALL'
+            for button in self.selection_bar_buttons:
+                button.draw(self.screen, self.small_font)
+            return
+
         # Input box and button
         self.task_input.draw(self.screen, self.small_font)
         self.add_task_button.draw(self.screen, self.small_font)
 
     def handle_categories_click(self, pos):
         """Handle clicks in categories view"""
+        if self.search_button.is_clicked(pos):
+            self.open_search()
+            return
+
         # Check add button
         if self.add_category_button.is_clicked(pos):
             text = self.category_input.get_text()
@@ -858,44 +2863,8 @@ class TodoApp:
                 self.category_input.clear()
             return
 
-        # Check category cards with scroll offset
-        y_offset = 140
-        start_idx = self.category_scroll
-        end_idx = min(start_idx + self.items_per_page, len(self.categories))
-
-        for i in range(start_idx, end_idx):
-            category = self.categories[i]
-            card_rect = pygame.Rect(80, y_offset, 640, 55)
-            edit_btn_rect = pygame.Rect(
-                card_rect.right - 105, card_rect.y + 10, 45, 35)
-            delete_btn_rect = pygame.Rect(
-                card_rect.right - 55, card_rect.y + 10, 45, 35)
-
-            if edit_btn_rect.collidepoint(pos):
-                # Show confirmation for editing
-                self.confirming_action = {
-                    'action': 'edit_category',
-                    'data': {'id': category['_id'], 'name': category['name']}
-                }
-                return
-
-            if delete_btn_rect.collidepoint(pos):
-                # Show confirmation for deleting
-                self.confirming_action = {
-                    'action': 'delete_category',
-                    'data': {'id': category['_id'], 'name': category['name']}
-                }
-                return
-
-            if card_rect.collidepoint(pos):
-                self.current_view = 'tasks'
-                self.selected_category_id = category['_id']
-                self.selected_category_name = category['name']
-                self.load_tasks(category['_id'])
-                self.task_scroll = 0  # Reset task scroll
-                return
-
-            y_offset += 65
+        # Category cards and their buttons
+        self.hit_map.click(pos)
 
     def handle_tasks_click(self, pos):
         """Handle clicks in tasks view"""
@@ -906,13 +2875,16 @@ class TodoApp:
             self.task_input.clear()
             self.category_scroll = 0  # Reset category scroll
             self.show_only_undone = False  # Reset filter
+            self.set_selecting(False)
             return
 
-        # Check filter checkbox
-        filter_checkbox_rect = pygame.Rect(200, 130, 24, 24)
-        if filter_checkbox_rect.collidepoint(pos):
-            self.show_only_undone = not self.show_only_undone
-            self.task_scroll = 0  # Reset scroll when filter changes
+        # Check selection mode button
+        if self.select_button.is_clicked(pos):
+            self.set_selecting(not self.selecting)
+            return
+
+        if self.selecting:
+            self.handle_selection_click(pos)
             return
 
         # Check add button
@@ -923,65 +2895,189 @@ class TodoApp:
                 self.task_input.clear()
             return
 
-        # Get filtered tasks for click detection
-        if self.show_only_undone:
-            filtered_tasks = [
-                task for task in self.tasks if not task['completed']]
-        else:
-            filtered_tasks = self.tasks
-
-        # Check task cards with scroll offset
-        y_offset = 160
-        start_idx = self.task_scroll
-        end_idx = min(start_idx + self.items_per_page, len(filtered_tasks))
+        # Filter checkbox, task cards and their buttons
+        self.hit_map.click(pos)
 
-        for i in range(start_idx, end_idx):
-            task = filtered_tasks[i]
-            card_rect = pygame.Rect(80, y_offset, 640, 55)
-            checkbox_rect = pygame.Rect(
-                card_rect.x + 15, card_rect.y + 15, 28, 28)
-            view_btn_rect = pygame.Rect(
-                card_rect.right - 155, card_rect.y + 10, 45, 35)
-            edit_btn_rect = pygame.Rect(
-                card_rect.right - 105, card_rect.y + 10, 45, 35)
-            delete_btn_rect = pygame.Rect(
-                card_rect.right - 55, card_rect.y + 10, 45, 35)
-
-            if view_btn_rect.collidepoint(pos):
-                # Show full task text
-                self.viewing_task = task
-                return
-
-            if edit_btn_rect.collidepoint(pos):
-                # Show confirmation for editing
-                self.confirming_action = {
-                    'action': 'edit_task',
-                    'data': {'id': task['_id'], 'name': task['name']}
-                }
-                return
-
-            if delete_btn_rect.collidepoint(pos):
-                # Show confirmation for deleting
+    def handle_selection_click(self, pos):
+        """Handle clicks on task cards and the bulk action bar while
+        selecting"""
+        if self.select_all_button.is_clicked(pos):
+            if self.selection.all and not self.selection.docs:
+                self.selection.clear()
+            else:
+                self.selection.select_all()
+            return
+        if self.complete_selected_button.is_clicked(pos):
+            self.apply_to_selection('complete')
+            return
+        if self.reopen_selected_button.is_clicked(pos):
+            self.apply_to_selection('reopen')
+            return
+        if self.delete_selected_button.is_clicked(pos):
+            count = self.selection.count(self.task_total())
+            if count:
                 self.confirming_action = {
-                    'action': 'delete_task',
-                    'data': {'id': task['_id'], 'name': task['name']}
-                }
-                return
-
-            if checkbox_rect.collidepoint(pos):
-                # Toggle task directly without confirmation when clicking checkbox
-                self.toggle_task(task['_id'])
-                return
+                    'action': 'delete_selected', 'data': {'count': count}}
+            return
 
-            y_offset += 65
+        # Filter checkbox and task cards
+        self.hit_map.click(pos)
+
+    def select_card(self, position, task):
+        """Select a clicked task card, Shift extends the selection"""
+        extend = self.key_mods & pygame.KMOD_SHIFT
+        self.select_task(position, task, extend=bool(extend))
+
+    def open_category(self, category):
+        """Show the tasks view of a category"""
+        self.current_view = 'tasks'
+        self.selected_category_id = category['_id']
+        self.selected_category_name = category['name']
+        self.task_scroll = 0  # Reset task scroll
+        self.load_tasks(category['_id'])
+
+    def confirm_item(self, action, item):
+        """Ask before editing or deleting a category or task"""
+        self.confirming_action = {
+            'action': action,
+            'data': {'id': item['_id'], 'name': item['name']}
+        }
+
+    def view_task(self, task):
+        """Show the full text of a task"""
+        self.viewing_task = task
+        self.view_scroll = 0
+
+    def toggle_undone_filter(self):
+        """Show only undone tasks, or all of them again"""
+        self.show_only_undone = not self.show_only_undone
+        self.task_scroll = 0  # Reset scroll when filter changes
+        self.selection.clear()  # "All" depends on the filter
+        self.show_task_filter()
+
+    def process_storage_results(self):
+        """Apply finished storage work, True if there was any"""
+        if not self.storage_worker.process_results():
+            return False
+        # The data behind an open dialog may have changed
+        self.modal_background = None
+        return True
+
+    def mark_dirty(self, rect=None):
+        """Schedule a region (or the whole screen) for redrawing"""
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+    def _hover_rects(self):
+        """Regions whose look depends on the mouse position"""
+        if self.confirming_action or self.viewing_task:
+            return [self.dialog_area_rect]
+        if self.editing_item:
+            return []
+        return [self.list_area_rect,
+                self.back_button.rect.inflate(8, 8),
+                self.select_button.rect.inflate(8, 8),
+                self.search_button.rect.inflate(8, 8),
+                self.add_category_button.rect.inflate(8, 8)] + [
+                    button.rect.inflate(8, 8)
+                    for button in self.selection_bar_buttons]
+
+    def _active_input(self):
+        """The input box that currently receives cursor updates"""
+        if self.editing_item:
+            return self.edit_input
+        elif self.current_view == 'categories':
+            return self.category_input
+        elif self.current_view == 'search':
+            return self.search_input
+        return self.task_input
+
+    def _pulse_active(self):
+        """Whether the new-task pulse still needs animation frames"""
+        if not self.new_task_id:
+            return False
+        elapsed = pygame.time.get_ticks() - self.new_task_start_time
+        if elapsed >= self.new_task_pulse_duration:
+            # Pulse finished, draw the card one last time without it
+            self.new_task_id = None
+            self.mark_dirty(self.list_area_rect)
+            return False
+        return self.current_view == 'tasks'
+
+    def _wait_for_events(self):
+        """Block until an event arrives or a timed update is due"""
+        timeout = self._active_input().next_update_in()
+        if timeout is None:
+            timeout = IDLE_TIMEOUT_MS
+        if self.show_profiler:
+            timeout = min(timeout, PROFILER_REFRESH_MS)
+        if self.write_flush_at is not None:
+            timeout = min(timeout, max(
+                0, self.write_flush_at - pygame.time.get_ticks()))
+        if timeout <= 0:
+            return pygame.event.get()
+        event = pygame.event.wait(min(timeout, IDLE_TIMEOUT_MS))
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
 
     def run(self):
         """Main game loop"""
         running = True
 
         while running:
+            self.profiler.begin_frame()
+
+            # Apply finished background database work
+            if self.process_storage_results():
+                self.mark_dirty()
+            if (self.write_flush_at is not None
+                    and pygame.time.get_ticks() >= self.write_flush_at):
+                self.flush_writes()
+            self.profiler.lap('storage')
+
+            events = pygame.event.get()
+            if (REDRAW_ONLY_WHEN_DIRTY and not events and not self.full_redraw
+                    and not self.dirty_rects and not self._pulse_active()
+                    and self.search_query is None):
+                # Nothing to draw: sleep until something happens
+                events = self._wait_for_events()
+                self.profiler.lap('idle')
+                if self.process_storage_results():
+                    self.mark_dirty()
+                self.profiler.lap('storage')
+
+            for event in events:
+                if event.type == pygame.MOUSEMOTION:
+                    # Only hover effects depend on the mouse position
+                    for rect in self._hover_rects():
+                        self.mark_dirty(rect)
+                elif event.type not in (pygame.NOEVENT, STORAGE_EVENT):
+                    self.mark_dirty()
+
             # Handle events
-            for event in pygame.event.get():
+            layout_changed = False
+            for event in events:
+                # A click, scroll or key earlier in this batch may have
+                # changed the layout the hit map was built from: lay it
+                # out again before handling a click (the frame is redrawn
+                # in full after events like these anyway)
+                if (layout_changed and event.type == pygame.MOUSEBUTTONDOWN
+                        and not (self.confirming_action or self.editing_item
+                                 or self.viewing_task)):
+                    self.draw_view(event.pos)
+                    layout_changed = False
+                if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEWHEEL,
+                                  pygame.KEYDOWN):
+                    layout_changed = True
+                if event.type in (pygame.KEYDOWN, pygame.KEYUP,
+                                  pygame.MOUSEBUTTONDOWN):
+                    # Key events carry the modifiers; clicks only when
+                    # posted with them
+                    self.key_mods = getattr(event, 'mod', self.key_mods)
+
                 if event.type == pygame.QUIT:
                     running = False
 
@@ -992,22 +3088,48 @@ class TodoApp:
                             0, len(self.categories) - self.items_per_page)
                         self.category_scroll = max(
                             0, min(max_scroll, self.category_scroll - event.y))
+                    elif self.current_view == 'search':
+                        max_scroll = max(
+                            0, len(self.search_results) - self.items_per_page)
+                        self.search_scroll = max(
+                            0, min(max_scroll, self.search_scroll - event.y))
                     else:
-                        # Get filtered task count for scrolling
-                        if self.show_only_undone:
-                            filtered_task_count = len(
-                                [task for task in self.tasks if not task['completed']])
-                        else:
-                            filtered_task_count = len(self.tasks)
                         max_scroll = max(
-                            0, filtered_task_count - self.items_per_page)
+                            0, self.task_total() - self.items_per_page)
                         self.task_scroll = max(
                             0, min(max_scroll, self.task_scroll - event.y))
 
+                # F5 reloads everything from the database
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                    self.refresh()
+
+                # Ctrl+F opens search from any view
+                if (event.type == pygame.KEYDOWN and event.key == pygame.K_f
+                        and event.mod & pygame.KMOD_CTRL
+                        and not self.editing_item and not self.confirming_action
+                        and not self.viewing_task):
+                    self.open_search()
+                    continue
+
+                # F3 toggles the frame profiler, F4 dumps its history
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.show_profiler = not self.show_profiler
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    self.dump_profile()
+
                 # Handle arrow key scrolling (UP/DOWN)
                 if event.type == pygame.KEYDOWN and not self.editing_item and not self.confirming_action and not self.viewing_task:
                     # Only allow scrolling when not typing in input boxes
-                    if not (self.category_input.active or self.task_input.active):
+                    if self.current_view == 'search':
+                        # The search box keeps focus, arrows scroll results
+                        if event.key == pygame.K_DOWN:
+                            max_scroll = max(
+                                0, len(self.search_results) - self.items_per_page)
+                            self.search_scroll = min(
+                                max_scroll, self.search_scroll + 1)
+                        elif event.key == pygame.K_UP:
+                            self.search_scroll = max(0, self.search_scroll - 1)
+                    elif not (self.category_input.active or self.task_input.active):
                         if event.key == pygame.K_DOWN:
                             if self.current_view == 'categories':
                                 max_scroll = max(
@@ -1015,14 +3137,8 @@ class TodoApp:
                                 self.category_scroll = min(
                                     max_scroll, self.category_scroll + 1)
                             else:
-                                # Get filtered task count for scrolling
-                                if self.show_only_undone:
-                                    filtered_task_count = len(
-                                        [task for task in self.tasks if not task['completed']])
-                                else:
-                                    filtered_task_count = len(self.tasks)
                                 max_scroll = max(
-                                    0, filtered_task_count - self.items_per_page)
+                                    0, self.task_total() - self.items_per_page)
                                 self.task_scroll = min(
                                     max_scroll, self.task_scroll + 1)
                         elif event.key == pygame.K_UP:
@@ -1034,9 +3150,19 @@ class TodoApp:
 
                 # Handle viewing mode
                 if self.viewing_task:
+                    if event.type == pygame.MOUSEWHEEL:
+                        self.scroll_view_text(-event.y)
+                    elif event.type == pygame.KEYDOWN and event.key in (
+                            pygame.K_UP, pygame.K_DOWN):
+                        self.scroll_view_text(
+                            1 if event.key == pygame.K_DOWN else -1)
+                    elif event.type == pygame.KEYDOWN and event.key in (
+                            pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                        page = self.VIEW_TEXT_LINES - 1
+                        self.scroll_view_text(
+                            page if event.key == pygame.K_PAGEDOWN else -page)
                     if event.type == pygame.MOUSEBUTTONDOWN:
-                        close_btn_rect = pygame.Rect(325, 390, 150, 45)
-                        if close_btn_rect.collidepoint(event.pos):
+                        if self.close_button.is_clicked(event.pos):
                             self.viewing_task = None
                     elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                         self.viewing_task = None
@@ -1045,12 +3171,7 @@ class TodoApp:
                 # Handle confirmation mode
                 if self.confirming_action:
                     if event.type == pygame.MOUSEBUTTONDOWN:
-                        # Yes button
-                        yes_btn_rect = pygame.Rect(250, 340, 120, 50)
-                        # No button
-                        no_btn_rect = pygame.Rect(430, 340, 120, 50)
-
-                        if yes_btn_rect.collidepoint(event.pos):
+                        if self.yes_button.is_clicked(event.pos):
                             # Execute the action
                             action = self.confirming_action['action']
                             data = self.confirming_action['data']
@@ -1064,9 +3185,9 @@ class TodoApp:
                             elif action == 'delete_task':
                                 self.delete_task(data['id'])
                                 # Adjust scroll if needed
-                                if self.task_scroll >= len(self.tasks):
+                                if self.task_scroll >= self.task_total():
                                     self.task_scroll = max(
-                                        0, len(self.tasks) - self.items_per_page)
+                                        0, self.task_total() - self.items_per_page)
                             elif action == 'edit_category':
                                 # Start editing
                                 self.editing_item = {
@@ -1083,9 +3204,11 @@ class TodoApp:
                                     data['name'])
                             elif action == 'toggle_task':
                                 self.toggle_task(data['id'])
+                            elif action == 'delete_selected':
+                                self.apply_to_selection('delete')
 
                             self.confirming_action = None
-                        elif no_btn_rect.collidepoint(event.pos) or not pygame.Rect(200, 230, 400, 180).collidepoint(event.pos):
+                        elif self.no_button.is_clicked(event.pos) or not self.confirm_dialog_rect.collidepoint(event.pos):
                             # Cancel action
                             self.confirming_action = None
                     continue
@@ -1112,10 +3235,23 @@ class TodoApp:
                         self.edit_input.clear()
                     continue
 
+                # ESC leaves selection mode and the search view
+                if (self.selecting and event.type == pygame.KEYDOWN
+                        and event.key == pygame.K_ESCAPE):
+                    self.set_selecting(False)
+                if (self.current_view == 'search'
+                        and event.type == pygame.KEYDOWN
+                        and event.key == pygame.K_ESCAPE):
+                    self.current_view = 'categories'
+                    self.search_input.active = False
+                    continue
+
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if not self.viewing_task:
                         if self.current_view == 'categories':
                             self.handle_categories_click(event.pos)
+                        elif self.current_view == 'search':
+                            self.handle_search_click(event.pos)
                         else:
                             self.handle_tasks_click(event.pos)
 
@@ -1128,7 +3264,13 @@ class TodoApp:
                             if text.strip():
                                 self.add_category(text)
                                 self.category_input.clear()
-                    else:
+                    elif self.current_view == 'search':
+                        if self.search_input.handle_event(event):
+                            # Enter opens the first result
+                            if self.search_results:
+                                self.open_search_result(
+                                    self.search_results[0])
+                    elif not self.selecting:
                         if self.task_input.handle_event(event):
                             # Enter was pressed
                             text = self.task_input.get_text()
@@ -1136,176 +3278,350 @@ class TodoApp:
                                 self.add_task(self.selected_category_id, text)
                                 self.task_input.clear()
 
-            # Update input boxes for cursor animation
-            if self.editing_item:
-                self.edit_input.update()
-            elif self.current_view == 'categories':
-                self.category_input.update()
-            else:
-                self.task_input.update()
-
-            # Handle hover effects
-            mouse_pos = pygame.mouse.get_pos()
-            self.back_button.check_hover(mouse_pos)
-            self.add_category_button.check_hover(mouse_pos)
-            self.add_task_button.check_hover(mouse_pos)
+            self.profiler.lap('events')
 
-            # Draw
-            self.screen.fill(BG_COLOR)
+            # Update input boxes for cursor animation
+            active_input = self._active_input()
+            if active_input.update():
+                self.mark_dirty(active_input.rect)
+
+            if self._pulse_active():
+                self.mark_dirty(self.list_area_rect)
+
+            # Continue a running search within its frame budget
+            if self.update_search():
+                self.mark_dirty()
+
+            if not REDRAW_ONLY_WHEN_DIRTY:
+                self.mark_dirty()
+
+            # Keep the profiler overlay current while it is shown
+            if self.show_profiler and (
+                    self.full_redraw or self.dirty_rects or
+                    pygame.time.get_ticks() - self.profiler_drawn_at
+                    >= PROFILER_REFRESH_MS):
+                self.mark_dirty(self.profiler_rect)
+            self.profiler.lap('input')
+
+            # Draw only what changed
+            drew = self.full_redraw or bool(self.dirty_rects)
+            if self.full_redraw:
+                self.draw_frame()
+                self.profiler.lap('draw')
+                pygame.display.flip()
+                if not startup_timeline.has('first frame'):
+                    startup_timeline.mark('first frame')
+                    self._report_startup()
+            elif self.dirty_rects:
+                area = self.dirty_rects[0].unionall(self.dirty_rects[1:])
+                self.screen.set_clip(area)
+                self.draw_frame()
+                self.screen.set_clip(None)
+                self.profiler.lap('draw')
+                pygame.display.update(self.dirty_rects)
+            self.full_redraw = False
+            self.dirty_rects = []
+            self.profiler.lap('flip')
+            self.profiler.end_frame(self._db_operations(), drew)
 
-            if self.current_view == 'categories':
-                self.draw_categories_view()
-            else:
-                self.draw_tasks_view()
-
-            # Draw confirmation dialog if confirming
-            if self.confirming_action:
-                # Dim background
-                overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-                overlay.set_alpha(128)
-                overlay.fill((0, 0, 0))
-                self.screen.blit(overlay, (0, 0))
-
-                # Confirmation dialog box
-                dialog_rect = pygame.Rect(200, 230, 400, 180)
-                PixelBox.draw(self.screen, dialog_rect, WHITE_COLOR, 6)
-
-                # Title and message based on action
-                action = self.confirming_action['action']
-                data = self.confirming_action['data']
-
-                if action == 'delete_category':
-                    title_text = 'DELETE GOAL?'
-                    msg_text = 'ALL TASKS WILL BE LOST'
-                elif action == 'delete_task':
-                    title_text = 'DELETE TASK?'
-                    msg_text = 'THIS CANNOT BE UNDONE'
-                elif action == 'edit_category':
-                    title_text = 'EDIT GOAL?'
-                    msg_text = 'CHANGE GOAL NAME'
-                elif action == 'edit_task':
-                    title_text = 'EDIT TASK?'
-                    msg_text = 'CHANGE TASK NAME'
-                elif action == 'toggle_task':
-                    if data['completed']:
-                        title_text = 'MARK INCOMPLETE?'
-                        msg_text = 'UNDO COMPLETION'
-                    else:
-                        title_text = 'MARK COMPLETE?'
-                        msg_text = 'FINISH THIS TASK'
-
-                # Draw title
-                title = self.font.render(title_text, False, TEXT_COLOR)
-                title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 260))
-                self.screen.blit(title, title_rect)
-
-                # Draw message
-                msg = self.small_font.render(msg_text, False, (100, 100, 100))
-                msg_rect = msg.get_rect(center=(SCREEN_WIDTH // 2, 300))
-                self.screen.blit(msg, msg_rect)
-
-                # Yes button
-                yes_btn = Button(250, 340, 120, 50, 'YES',
-                                 GREEN_COLOR, WHITE_COLOR)
-                yes_btn.check_hover(pygame.mouse.get_pos())
-                yes_btn.draw(self.screen, self.small_font)
-
-                # No button
-                no_btn = Button(430, 340, 120, 50, 'NO',
-                                RED_COLOR, WHITE_COLOR)
-                no_btn.check_hover(pygame.mouse.get_pos())
-                no_btn.draw(self.screen, self.small_font)
-
-            # Draw edit dialog if editing
-            elif self.editing_item:
-                # Dim background
-                overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-                overlay.set_alpha(128)
-                overlay.fill((0, 0, 0))
-                self.screen.blit(overlay, (0, 0))
-
-                # Edit dialog box
-                dialog_rect = pygame.Rect(150, 250, 500, 150)
-                PixelBox.draw(self.screen, dialog_rect, WHITE_COLOR, 6)
-
-                # Title
-                title_text = 'EDIT ' + self.editing_item['type'].upper()
-                title = self.font.render(title_text, False, TEXT_COLOR)
-                title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 280))
-                self.screen.blit(title, title_rect)
-
-                # Input box
-                self.edit_input.draw(self.screen, self.small_font)
-
-                # Instructions
-                hint = self.small_font.render(
-                    'PRESS ENTER TO SAVE', False, (100, 100, 100))
-                hint_rect = hint.get_rect(center=(SCREEN_WIDTH // 2, 370))
-                self.screen.blit(hint, hint_rect)
-
-            # Draw viewing dialog if viewing a task
-            elif self.viewing_task:
-                # Dim background
-                overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-                overlay.set_alpha(128)
-                overlay.fill((0, 0, 0))
-                self.screen.blit(overlay, (0, 0))
-
-                # View dialog box
-                dialog_rect = pygame.Rect(100, 200, 600, 250)
-                PixelBox.draw(self.screen, dialog_rect, WHITE_COLOR, 6)
-
-                # Title
-                title = self.font.render('FULL TASK', False, TEXT_COLOR)
-                title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 230))
-                self.screen.blit(title, title_rect)
-
-                # Task text (word-wrapped)
-                task_text = self.viewing_task['name']
-                words = task_text.split(' ')
-                lines = []
-                current_line = ''
-                max_width = 550
-
-                for word in words:
-                    test_line = current_line + \
-                        (' ' if current_line else '') + word
-                    test_surface = self.small_font.render(
-                        test_line, False, TEXT_COLOR)
-                    if test_surface.get_width() <= max_width:
-                        current_line = test_line
-                    else:
-                        if current_line:
-                            lines.append(current_line)
-                        current_line = word
-                if current_line:
-                    lines.append(current_line)
-
-                # Draw lines
-                y_pos = 270
-                for line in lines[:6]:  # Max 6 lines
-                    line_surface = self.small_font.render(
-                        line, False, TEXT_COLOR)
-                    line_rect = line_surface.get_rect(
-                        center=(SCREEN_WIDTH // 2, y_pos))
-                    self.screen.blit(line_surface, line_rect)
-                    y_pos += 20
-
-                # Close button
-                close_btn = Button(325, 390, 150, 45, 'CLOSE',
-                                   RED_COLOR, WHITE_COLOR)
-                close_btn.check_hover(pygame.mouse.get_pos())
-                close_btn.draw(self.screen, self.small_font)
-
-            pygame.display.flip()
             self.clock.tick(FPS)
 
         # Cleanup
         pygame.quit()
-        client.close()
+        self.flush_writes()
+        self.storage_worker.stop()
+        if self.write_behind.pending:
+            print(f"⚠ {len(self.write_behind)} edits could not be saved, "
+                  f"they are retried on the next start")
+        self.write_behind.close()
+        # Stopped after the last flush, so a replica can still push it
+        if self.change_feed:
+            self.change_feed.stop()
+        if self.storage:
+            self.storage.close()
         sys.exit()
 
+    def _db_operations(self):
+        """Running count of operations the storage backend has sent"""
+        operations = getattr(self.storage, 'operations', None)
+        return operations.count if operations else 0
 
-if __name__ == '__main__':
-    app = TodoApp()
+    def dump_profile(self):
+        """Write the profiler's frame history to a JSON lines file"""
+        path = datetime.now().strftime('frame_profile_%Y%m%d_%H%M%S.jsonl')
+        try:
+            count = self.profiler.dump(path)
+            print(f"✓ Wrote {count} frames to {path}")
+        except OSError as e:
+            print(f"✗ Could not write frame profile: {e}")
+
+    def draw_profiler(self):
+        """Draw the frame profiler overlay"""
+        self.profiler_drawn_at = pygame.time.get_ticks()
+        surface = self.profiler_surface
+        surface.fill((0, 0, 0, 190))
+        frames = self.profiler.recent(120)
+
+        # Frame time graph, bars scaled so the top is two 60 FPS frames
+        graph_height = 44
+        budget_ms = 1000 / FPS
+        for i, frame in enumerate(frames):
+            height = min(graph_height,
+                         int(frame['busy_ms'] / (2 * budget_ms) * graph_height))
+            color = GREEN_COLOR if frame['busy_ms'] <= budget_ms else RED_COLOR
+            pygame.draw.rect(surface, color,
+                             (8 + i * 2, 8 + graph_height - height, 2, height))
+        budget_y = 8 + graph_height // 2
+        pygame.draw.line(surface, ACCENT_COLOR,
+                         (8, budget_y), (248, budget_y), 1)
+
+        # Averages over the graphed frames
+        if frames:
+            def average(key):
+                return sum(frame[key] for frame in frames) / len(frames)
+            busy = sorted(frame['busy_ms'] for frame in frames)
+            lines = [
+                f'FRAME {average("busy_ms"):.1f} P95 '
+                f'{busy[int(len(busy) * 0.95)]:.1f}MS',
+                f'EV {average("events_ms"):.1f} IN {average("input_ms"):.1f} '
+                f'DB {average("storage_ms"):.1f}',
+                f'DRAW {average("draw_ms"):.1f} FLIP {average("flip_ms"):.1f}',
+                f'DB OPS {average("db_ops"):.1f}/FRAME',
+                f'TEXT HIT {text_cache.stats()["hit_rate"] * 100:.0f}%',
+            ]
+        else:
+            lines = ['NO FRAMES YET']
+        for i, line in enumerate(lines):
+            text = text_cache.render(self.small_font, line, False, WHITE_COLOR)
+            surface.blit(text, (8, 58 + i * 13))
+
+        self.screen.blit(surface, self.profiler_rect)
+
+    def draw_frame(self):
+        """Draw the current view, any open dialog and the profiler"""
+        self.draw_scene()
+        if self.show_profiler:
+            self.draw_profiler()
+
+    def draw_scene(self):
+        """Draw the current view and any open dialog"""
+        mouse_pos = pygame.mouse.get_pos()
+        if (self.confirming_action or self.editing_item
+                or self.viewing_task):
+            # The view stays frozen behind the dialog
+            self.screen.blit(self._modal_background(), (0, 0))
+        else:
+            self.modal_background = None
+            self.draw_view(mouse_pos)
+
+        # Draw confirmation dialog if confirming
+        if self.confirming_action:
+            # Confirmation dialog box
+            PixelBox.draw(
+                self.screen, self.confirm_dialog_rect, WHITE_COLOR, 6)
+
+            # Title and message based on action
+            action = self.confirming_action['action']
+            data = self.confirming_action['data']
+
+            if action == 'delete_category':
+                title_text = 'DELETE GOAL?'
+                msg_text = 'ALL TASKS WILL BE LOST'
+            elif action == 'delete_task':
+                title_text = 'DELETE TASK?'
+                msg_text = 'THIS CANNOT BE UNDONE'
+            elif action == 'edit_category':
+                title_text = 'EDIT GOAL?'
+                msg_text = 'CHANGE GOAL NAME'
+            elif action == 'edit_task':
+                title_text = 'EDIT TASK?'
+                msg_text = 'CHANGE TASK NAME'
+            elif action == 'delete_selected':
+                title_text = 'DELETE TASKS?'
+                msg_text = f"{data['count']} TASKS WILL BE LOST"
+            elif action == 'toggle_task':
+                if data['completed']:
+                    title_text = 'MARK INCOMPLETE?'
+                    msg_text = 'UNDO COMPLETION'
+                else:
+                    title_text = 'MARK COMPLETE?'
+                    msg_text = 'FINISH THIS TASK'
+
+            # Draw title
+            title = text_cache.render(self.font, title_text, False, TEXT_COLOR)
+            title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 260))
+            self.screen.blit(title, title_rect)
+
+            # Draw message
+            msg = text_cache.render(
+                self.small_font, msg_text, False, (100, 100, 100))
+            msg_rect = msg.get_rect(center=(SCREEN_WIDTH // 2, 300))
+            self.screen.blit(msg, msg_rect)
+
+            # Yes and no buttons
+            self.yes_button.check_hover(mouse_pos)
+            self.yes_button.draw(self.screen, self.small_font)
+            self.no_button.check_hover(mouse_pos)
+            self.no_button.draw(self.screen, self.small_font)
+
+        # Draw edit dialog if editing
+        elif self.editing_item:
+            # Edit dialog box
+            dialog_rect = pygame.Rect(150, 250, 500, 150)
+            PixelBox.draw(self.screen, dialog_rect, WHITE_COLOR, 6)
+
+            # Title
+            title_text = 'EDIT ' + self.editing_item['type'].upper()
+            title = text_cache.render(self.font, title_text, False, TEXT_COLOR)
+            title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 280))
+            self.screen.blit(title, title_rect)
+
+            # Input box
+            self.edit_input.draw(self.screen, self.small_font)
+
+            # Instructions
+            hint = text_cache.render(
+                self.small_font, 'PRESS ENTER TO SAVE', False, (100, 100, 100))
+            hint_rect = hint.get_rect(center=(SCREEN_WIDTH // 2, 370))
+            self.screen.blit(hint, hint_rect)
+
+        # Draw viewing dialog if viewing a task
+        elif self.viewing_task:
+            # View dialog box
+            dialog_rect = pygame.Rect(100, 200, 600, 250)
+            PixelBox.draw(self.screen, dialog_rect, WHITE_COLOR, 6)
+
+            # Title
+            title = text_cache.render(
+                self.font, 'FULL TASK', False, TEXT_COLOR)
+            title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 230))
+            self.screen.blit(title, title_rect)
+
+            # Task text, word-wrapped once; only visible lines are drawn
+            lines = self._view_text_lines()
+            first = self.view_scroll
+            y_pos = 270
+            for line in lines[first:first + self.VIEW_TEXT_LINES]:
+                line_surface = text_cache.render(
+                    self.small_font, line, False, TEXT_COLOR)
+                line_rect = line_surface.get_rect(
+                    center=(SCREEN_WIDTH // 2, y_pos))
+                self.screen.blit(line_surface, line_rect)
+                y_pos += 20
+            if len(lines) > self.VIEW_TEXT_LINES:
+                PixelBox.paint_frame(
+                    self.screen, self.VIEW_SCROLLBAR_RECT, SHADOW_COLOR, 2)
+                self.draw_scrollbar(
+                    len(lines), first, self.VIEW_SCROLLBAR_RECT,
+                    self.VIEW_TEXT_LINES)
+
+            # Close button
+            self.close_button.check_hover(mouse_pos)
+            self.close_button.draw(self.screen, self.small_font)
+
+    def _view_text_lines(self):
+        """Wrapped lines of the task in the view dialog"""
+        return text_layout.lines(
+            self.small_font, self.viewing_task['name'], self.VIEW_TEXT_WIDTH)
+
+    def scroll_view_text(self, lines):
+        """Scroll the view dialog's task text by a number of lines"""
+        max_scroll = max(
+            0, len(self._view_text_lines()) - self.VIEW_TEXT_LINES)
+        self.view_scroll = max(0, min(max_scroll, self.view_scroll + lines))
+
+    def draw_view(self, mouse_pos):
+        """Draw the current view without any dialog, laying out its
+        hit map"""
+        self.mouse_pos = mouse_pos
+        self.hit_map.clear()
+        self.back_button.check_hover(mouse_pos)
+        self.add_category_button.check_hover(mouse_pos)
+        self.add_task_button.check_hover(mouse_pos)
+        self.select_button.check_hover(mouse_pos)
+        self.search_button.check_hover(mouse_pos)
+        for button in self.selection_bar_buttons:
+            button.check_hover(mouse_pos)
+
+        self.screen.blit(self._view_chrome(), (0, 0))
+
+        if self.current_view == 'categories':
+            self.draw_categories_view()
+        elif self.current_view == 'search':
+            self.draw_search_view()
+        else:
+            self.draw_tasks_view()
+
+    def _modal_background(self):
+        """The current view dimmed, drawn off-screen once per dialog"""
+        if self.modal_background is None:
+            screen = self.screen
+            self.modal_background = pygame.Surface(screen.get_size())
+            self.screen = self.modal_background
+            try:
+                self.draw_view(pygame.mouse.get_pos())
+            finally:
+                self.screen = screen
+            self.modal_background.blit(self.dim_overlay, (0, 0))
+        return self.modal_background
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pokemon-style todo list')
+    parser.add_argument(
+        '--check-indexes', action='store_true',
+        help='ensure indexes and report query shapes that are not '
+             'index-backed, then exit')
+    parser.add_argument(
+        '--repair-counts', action='store_true',
+        help="recount every goal's task counters from its tasks, then exit")
+    parser.add_argument(
+        '--export', metavar='FILE',
+        help='write all goals and tasks to a JSONL file, then exit')
+    parser.add_argument(
+        '--import', dest='import_path', metavar='FILE',
+        help='add the goals and tasks of a JSONL export, then exit')
+    args = parser.parse_args()
+
+    if args.check_indexes:
+        storage = open_storage()
+        all_indexed = check_indexes(storage)
+        storage.close()
+        sys.exit(0 if all_indexed else 1)
+
+    if args.repair_counts:
+        storage = open_storage()
+        goals = storage.repair_task_counts()
+        storage.close()
+        print(f"✓ Recounted the tasks of {goals} goals")
+        sys.exit(0)
+
+    if args.export or args.import_path:
+        storage = open_storage()
+        start = time.perf_counter()
+        try:
+            if args.export:
+                goals, tasks = export_jsonl(storage, args.export)
+                print(f"✓ Exported {goals} goals and {tasks} tasks "
+                      f"in {time.perf_counter() - start:.1f}s")
+            else:
+                goals, tasks, skipped = import_jsonl(storage, args.import_path)
+                print(f"✓ Imported {goals} goals and {tasks} tasks "
+                      f"in {time.perf_counter() - start:.1f}s")
+                if skipped:
+                    print(f"⚠ Skipped {skipped} tasks without a goal")
+        except (OSError, ValueError) as e:
+            print(f"✗ Transfer failed: {e}")
+            sys.exit(1)
+        finally:
+            storage.close()
+        sys.exit(0)
+
+    app = TodoApp(journal_path=os.environ.get(
+        'TODO_JOURNAL_PATH', DEFAULT_JOURNAL_PATH))
     app.run()
+
+
+if __name__ == '__main__':
+    startup_timeline.mark('import')
+    main()
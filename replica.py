@@ -0,0 +1,402 @@
+"""
+Offline-first storage for the Pokemon Todo List
+A local SQLite replica of the MongoDB database serves every read at once,
+also while the server is down or still connecting. Writes land in the
+replica and in an outbox; a Replicator thread pushes the outbox and pulls
+other instances' changes whenever the server is reachable.
+"""
+import os
+import threading
+from datetime import datetime
+
+from storage import (DEFAULT_DB_NAME, DEFAULT_MONGO_URI, SQLiteStorage,
+                     WriteRejected, _timestamp, _utc_now, dump_json,
+                     load_json, open_storage)
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.pokemon_todo_cache.db')
+
+
+class ReplicaStorage(SQLiteStorage):
+    """Local replica of a remote backend with an outbox of local writes
+
+    Reads come from the replica. apply_writes() applies a batch to the
+    replica and queues it in the outbox in the same transaction; the
+    Replicator returned by change_feed() sends it on. Outbox entries that
+    edit one document keep the server's updated_at of that document as
+    their base, so edits made offline can be checked for conflicts when
+    they are pushed.
+
+    Each thread needs its own instance (see reopen()); instances of one
+    file share the outbox_changed event.
+    """
+
+    name = 'MongoDB (local cache)'
+    supports_sync = True
+
+    REPLICA_SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS versions (
+            id TEXT PRIMARY KEY,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS outbox (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            write TEXT NOT NULL,
+            doc_id TEXT,
+            base TEXT,
+            edited_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    '''
+    # Writes of a single document, checked for conflicts on push
+    SINGLE_WRITES = ('update_category', 'update_task',
+                     'delete_category', 'delete_task')
+
+    def __init__(self, connect, source, path=DEFAULT_CACHE_PATH,
+                 outbox_changed=None):
+        super().__init__(path)
+        self.conn.executescript(self.REPLICA_SCHEMA)
+        self.connect = connect  # Opens the remote backend
+        self.source = source
+        self.outbox_changed = outbox_changed or threading.Event()
+        previous = self.meta('source')
+        if previous != source:
+            # A new file, or a replica of another server: start over
+            unsent = self.conn.execute(
+                'SELECT COUNT(*) FROM outbox').fetchone()[0]
+            if unsent:
+                print(f"⚠ Dropped {unsent} unsent edits meant for {previous}")
+            with self._transaction():
+                for table in ('categories', 'tasks', 'versions', 'outbox',
+                              'meta'):
+                    self.conn.execute(f'DELETE FROM {table}')
+                self.set_meta('source', source)
+
+    def reopen(self):
+        """Another connection to the same replica, for another thread"""
+        return ReplicaStorage(self.connect, self.source, self.path,
+                              self.outbox_changed)
+
+    def change_feed(self, deliver):
+        """A Replicator keeping the replica and the server in step"""
+        return Replicator(self, deliver)
+
+    def meta(self, key):
+        row = self.conn.execute(
+            'SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row and row[0]
+
+    def set_meta(self, key, value):
+        with self._transaction():
+            self.conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                (key, value))
+
+    def apply_writes(self, writes):
+        """Apply writes to the replica and queue them for the server"""
+        edited_at = _timestamp(_utc_now())
+        with self._transaction():
+            super().apply_writes(writes)
+            for method, args in writes:
+                doc_id = base = None
+                if method in self.SINGLE_WRITES:
+                    doc_id = str(args[0])
+                    row = self.conn.execute(
+                        'SELECT updated_at FROM versions WHERE id = ?',
+                        (doc_id,)).fetchone()
+                    base = row and row[0]
+                self.conn.execute(
+                    'INSERT INTO outbox (write, doc_id, base, edited_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (dump_json([method, args]), doc_id, base, edited_at))
+        self.outbox_changed.set()
+
+    def outbox(self, limit=-1):
+        """The oldest queued writes, as
+        [(seq, method, args, doc_id, base, edited_at)]"""
+        rows = self.conn.execute(
+            'SELECT seq, write, doc_id, base, edited_at FROM outbox '
+            'ORDER BY seq LIMIT ?', (limit,))
+        return [(seq, *load_json(write), doc_id, base, edited_at)
+                for seq, write, doc_id, base, edited_at in rows]
+
+    def unqueue(self, seq):
+        """Drop the outbox entries up to seq once they are settled"""
+        with self._transaction():
+            self.conn.execute('DELETE FROM outbox WHERE seq <= ?', (seq,))
+
+    def _reapply_outbox(self):
+        # Keep local edits visible over what came from the server
+        SQLiteStorage.apply_writes(self, [
+            (method, tuple(args)) for _, method, args, *_ in self.outbox()])
+
+    def _drop_orphans(self):
+        """Discard queued task inserts whose goal is gone from the
+        replica, so neither the replica nor the server gets them"""
+        categories = {row[0] for row in self.conn.execute(
+            'SELECT id FROM categories')}
+        orphans = []
+        for seq, method, args, *_ in self.outbox():
+            if method == 'insert_category':
+                categories.add(str(args[0]['_id']))
+            elif (method == 'insert_task'
+                    and str(args[0]['category_id']) not in categories):
+                orphans.append((seq,))
+        if orphans:
+            self.conn.executemany('DELETE FROM outbox WHERE seq = ?', orphans)
+            print(f"⚠ Sync conflict: dropped {len(orphans)} offline tasks "
+                  f"of goals deleted on the server")
+
+    def _put(self, collection, docs):
+        """Store documents from the server along with their versions"""
+        if collection == 'categories':
+            self._insert_categories(docs, 'INSERT OR REPLACE')
+        else:
+            self._insert_tasks(docs, 'INSERT OR REPLACE')
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO versions (id, updated_at) VALUES (?, ?)',
+            [(str(doc['_id']), _timestamp(doc['updated_at']))
+             for doc in docs if doc.get('updated_at')])
+
+    def apply_remote(self, changes):
+        """Write changes pulled from the server into the replica
+
+        Documents with edits waiting in the outbox keep their local
+        state. Returns the changes that were applied.
+        """
+        pending = {row[0] for row in self.conn.execute(
+            'SELECT DISTINCT doc_id FROM outbox WHERE doc_id IS NOT NULL')}
+        applied = []
+        with self._transaction():
+            for change in changes:
+                if change[0] == 'upsert':
+                    collection, doc = change[1], change[2]
+                    if str(doc['_id']) in pending:
+                        continue
+                    self._put(collection, [doc])
+                elif change[1] == 'categories':
+                    for category_id in change[2]['ids']:
+                        self.delete_category(category_id)
+                else:
+                    self.delete_tasks(change[2])
+                applied.append(change)
+            if any(change[:2] == ('delete', 'categories')
+                   for change in applied):
+                self._drop_orphans()
+            if pending and any(change[0] == 'delete' for change in applied):
+                self._reapply_outbox()
+        return applied
+
+    def reset(self, categories, tasks, batch_size=1000):
+        """Replace the replica's documents with the server's, keeping the
+        effect of the writes still in the outbox"""
+        with self._transaction():
+            for table in ('categories', 'tasks', 'versions'):
+                self.conn.execute(f'DELETE FROM {table}')
+            for collection, docs in (('categories', categories),
+                                     ('tasks', tasks)):
+                batch = []
+                for doc in docs:
+                    batch.append(doc)
+                    if len(batch) == batch_size:
+                        self._put(collection, batch)
+                        batch = []
+                self._put(collection, batch)
+            self._drop_orphans()
+            self._reapply_outbox()
+
+
+class Replicator:
+    """Keeps a ReplicaStorage and its server in step from a background
+    thread
+
+    Connects (retrying until the server answers), catches up on what
+    changed while this instance was away, then pushes the outbox whenever
+    it fills and follows other instances' changes with the server's
+    change feed. Pulled changes are written to the replica and handed to
+    deliver() in ChangeFeed's format.
+
+    Conflicts are settled when an offline edit is pushed: an update of a
+    document deleted on the server is dropped, and an update of a
+    document changed on the server since the edit's base version loses
+    if the server's change is newer. Deletes always win.
+    """
+
+    RETRY_SECONDS = 5
+    PUSH_BATCH = 500
+
+    def __init__(self, replica, deliver):
+        self.replica = replica
+        self.deliver = deliver
+        self.remote = None
+        self.feed = None
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self.thread = threading.Thread(
+            target=self._run, name='replicator', daemon=True)
+
+    @property
+    def mode(self):
+        return self.feed and self.feed.mode
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        """Push what is left in the outbox if online, then stop"""
+        self._stop.set()
+        self.replica.outbox_changed.set()
+        self.thread.join(timeout)
+
+    def _replica(self):
+        """This thread's connection to the replica"""
+        if not hasattr(self._local, 'replica'):
+            self._local.replica = self.replica.reopen()
+        return self._local.replica
+
+    def _connect(self):
+        warned = False
+        while not self._stop.is_set():
+            try:
+                return self.replica.connect()
+            except Exception as e:
+                if not warned:
+                    print(f"⚠ Working offline from the local cache ({e}), "
+                          f"retrying every {self.RETRY_SECONDS}s")
+                    warned = True
+            self._stop.wait(self.RETRY_SECONDS)
+        return None
+
+    def _run(self):
+        self.remote = self._connect()
+        if self.remote is None:
+            return
+        print(f"✓ Connected to {self.remote.name}, syncing the local cache")
+        # Started before catching up, so no change falls in between
+        self.feed = self.remote.change_feed(self._pulled)
+        self.feed.start()
+        caught_up = failing = False
+        while True:
+            self.replica.outbox_changed.clear()
+            stopping = self._stop.is_set()
+            try:
+                if not caught_up:
+                    self._catch_up()
+                    caught_up = True
+                self._push()
+            except Exception as e:
+                if not failing:
+                    print(f"⚠ Sync with {self.remote.name} failed ({e}), "
+                          f"edits stay in the local cache")
+                    failing = True
+            else:
+                if failing:
+                    print(f"✓ Synced with {self.remote.name} again")
+                    failing = False
+                if self.feed.mode:
+                    self._replica().set_meta(
+                        'synced_until', _timestamp(_utc_now()))
+            if stopping:
+                break
+            self.replica.outbox_changed.wait(self.RETRY_SECONDS)
+        self.feed.stop()
+        self.remote.close()
+
+    def _catch_up(self):
+        """Pull what changed on the server since the last sync, or all of
+        it when that is longer ago than the server keeps tombstones"""
+        synced_until = self._replica().meta('synced_until')
+        if synced_until:
+            since = datetime.fromisoformat(synced_until)
+            if _utc_now() - since < self.remote.DELETIONS_TTL:
+                keyed, _ = self.remote.changes_since(since)
+                self._pulled([change for key, change in keyed])
+                return
+        self._pulled([('reload',)])
+
+    def _pulled(self, changes):
+        # Runs on the replicator and on the change feed's thread
+        local = self._replica()
+        if any(change[0] == 'reload' for change in changes):
+            local.reset(self.remote.iter_categories(),
+                        self.remote.iter_tasks())
+            self.deliver([('reload',)])
+            return
+        applied = local.apply_remote(changes)
+        if applied:
+            self.deliver(applied)
+
+    def _push(self):
+        local = self._replica()
+        while True:
+            entries = local.outbox(self.PUSH_BATCH)
+            if not entries:
+                return
+            writes, restore = self._resolve(entries)
+            try:
+                self.remote.apply_writes(writes)
+            except WriteRejected as e:
+                print(f"✗ {self.remote.name} refused local edits, "
+                      f"reloading: {e}")
+                local.unqueue(entries[-1][0])
+                self._pulled([('reload',)])
+                continue
+            local.unqueue(entries[-1][0])
+            if restore:
+                self._pulled(restore)
+
+    def _resolve(self, entries):
+        """The writes to push, and the server's side (as pulled changes)
+        of the documents whose offline edits lost a conflict"""
+        def collection_of(method):
+            return 'categories' if method.endswith('category') else 'tasks'
+
+        checked = {}
+        for _, method, args, doc_id, _, _ in entries:
+            if doc_id and method.startswith('update'):
+                checked.setdefault(collection_of(method), []).append(args[0])
+        current = {collection: self.remote.documents(collection, ids)
+                   for collection, ids in checked.items()}
+
+        writes, restore = [], []
+        for _, method, args, doc_id, base, edited_at in entries:
+            if doc_id and method.startswith('update'):
+                collection = collection_of(method)
+                noun = 'goal' if collection == 'categories' else 'task'
+                doc = current[collection].get(args[0])
+                if doc is None:
+                    print(f"⚠ Sync conflict: dropped an offline edit of a "
+                          f"{noun} deleted on the server")
+                    restore.append(('delete', collection, {'ids': [args[0]]}))
+                    continue
+                version = doc.get('updated_at')
+                version = version and _timestamp(version)
+                if version and version != base and version > edited_at:
+                    print(f"⚠ Sync conflict: kept the server's newer version "
+                          f"of {noun} '{doc['name']}'")
+                    restore.append(('upsert', collection, doc))
+                    continue
+            writes.append((method, tuple(args)))
+        return writes, restore
+
+
+def open_replica():
+    """Open storage for the app: MongoDB through a local replica, so the
+    app starts and works without the server, or SQLite directly
+
+    TODO_CACHE_PATH moves the replica file, TODO_CACHE=off talks to
+    MongoDB directly. See open_storage() for the other variables.
+    """
+    backend = os.environ.get('TODO_STORAGE', 'mongo').lower()
+    if (backend != 'mongo'
+            or os.environ.get('TODO_CACHE', 'on').lower() == 'off'):
+        return open_storage()
+    uri = os.environ.get('TODO_MONGO_URI', DEFAULT_MONGO_URI)
+    replica = ReplicaStorage(
+        open_storage, f'{uri} {DEFAULT_DB_NAME}',
+        os.environ.get('TODO_CACHE_PATH', DEFAULT_CACHE_PATH))
+    replica.ensure_indexes()
+    return replica
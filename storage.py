@@ -0,0 +1,1215 @@
+"""
+Storage backends for the Pokemon Todo List
+MongoDB for shared deployments, SQLite for single-user installs
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import (DeleteMany, DeleteOne, MongoClient, ReplaceOne,
+                     UpdateMany, UpdateOne, monitoring)
+from pymongo.errors import BulkWriteError, PyMongoError, WriteError
+
+from sync import ChangeFeed
+
+DEFAULT_MONGO_URI = 'mongodb://localhost:27017/'
+DEFAULT_DB_NAME = 'hakim_todo'
+DEFAULT_SQLITE_PATH = os.path.join(
+    os.path.expanduser('~'), '.pokemon_todo.db')
+
+
+def _utc_now():
+    """Naive UTC time at MongoDB's millisecond precision, comparable
+    across machines in different time zones"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _timestamp(value):
+    """Fixed-width ISO text, so SQLite orders timestamps correctly"""
+    return value.isoformat(timespec='microseconds')
+
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return {'$oid': str(value)}
+    if isinstance(value, datetime):
+        return {'$datetime': _timestamp(value)}
+    raise TypeError(f"cannot store {type(value).__name__} as JSON")
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1:
+        if '$oid' in obj:
+            return ObjectId(obj['$oid'])
+        if '$datetime' in obj:
+            return datetime.fromisoformat(obj['$datetime'])
+    return obj
+
+
+def dump_json(value):
+    """JSON text of a write or document, ObjectIds and datetimes included"""
+    return json.dumps(value, default=_json_default)
+
+
+def load_json(text):
+    """Inverse of dump_json()"""
+    return json.loads(text, object_hook=_json_object_hook)
+
+
+class WriteRejected(Exception):
+    """The database refused a batch of writes; retrying would fail again"""
+
+
+class OperationCounter:
+    """Thread-safe count of the operations a backend sent to its database"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, n=1):
+        with self._lock:
+            self.count += n
+
+
+class _CommandCounter(monitoring.CommandListener):
+    """pymongo command monitoring hook feeding an OperationCounter"""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    def started(self, event):
+        self.counter.add()
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _plan_stages(plan):
+    """Yield every stage dict of an explain() plan tree"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+class MongoStorage:
+    """Stores categories and tasks in MongoDB collections"""
+
+    name = 'MongoDB'
+    # Other instances' edits can be followed, see sync.ChangeFeed
+    supports_sync = True
+
+    # Indexes backing every query shape the app runs: {collection: [keys]}
+    INDEXES = {
+        'categories': [
+            [('created_at', -1)],
+        ],
+        'tasks': [
+            # load_tasks and keyset pages: category_id, then page order
+            [('category_id', 1), ('created_at', -1), ('_id', -1)],
+            # progress counts, delete_category and filtered pages
+            [('category_id', 1), ('completed', 1), ('created_at', -1),
+             ('_id', -1)],
+        ],
+    }
+    # Polled by changes_since() when change streams are unavailable
+    SYNC_INDEXES = {
+        'categories': [[('updated_at', 1)]],
+        'tasks': [[('updated_at', 1)]],
+    }
+    # Deletion tombstones only need to outlive the slowest poller
+    DELETIONS_TTL = timedelta(days=1)
+    # Re-read this much before the last poll, for writers' clock skew
+    SYNC_OVERLAP = timedelta(seconds=10)
+    # Superseded indexes dropped by ensure_indexes()
+    LEGACY_INDEXES = {
+        'tasks': ['category_id_1_created_at_-1', 'category_id_1_completed_1'],
+    }
+
+    def __init__(self, uri=DEFAULT_MONGO_URI, db_name=DEFAULT_DB_NAME,
+                 timeout_ms=5000):
+        self.operations = OperationCounter()
+        self.client = MongoClient(
+            uri, serverSelectionTimeoutMS=timeout_ms,
+            event_listeners=[_CommandCounter(self.operations)])
+        self.client.server_info()  # Force connection check
+        self.db = self.client[db_name]
+        self.categories = self.db['categories']
+        self.tasks = self.db['tasks']
+        self.deletions = self.db['deletions']
+        self.ensure_task_counts()
+
+    def ensure_indexes(self):
+        """Create the declared indexes (a no-op when they exist)"""
+        for declared in (self.INDEXES, self.SYNC_INDEXES):
+            for collection, indexes in declared.items():
+                for keys in indexes:
+                    self.db[collection].create_index(keys)
+        self.deletions.create_index(
+            'deleted_at',
+            expireAfterSeconds=int(self.DELETIONS_TTL.total_seconds()))
+        for collection, names in self.LEGACY_INDEXES.items():
+            existing = self.db[collection].index_information()
+            for name in names:
+                if name in existing:
+                    self.db[collection].drop_index(name)
+
+    def query_plans(self):
+        """Explain each query shape, returns [(shape, index or None)]"""
+        sample_id = ObjectId()
+        shapes = [
+            ('categories sorted by created_at',
+             lambda: self.categories.find().sort('created_at', -1).explain()),
+            ('tasks of a category sorted by created_at',
+             lambda: self.tasks.find({'category_id': sample_id})
+             .sort('created_at', -1).explain()),
+            ('page of undone tasks after a key',
+             lambda: self.tasks.find(self._page_query(
+                 sample_id, (datetime.now(), sample_id), None, False))
+             .sort(self._PAGE_ORDER).limit(50).explain()),
+            ('completed tasks of a category',
+             lambda: self.db.command(
+                 'explain',
+                 {'count': 'tasks',
+                  'query': {'category_id': sample_id, 'completed': True}},
+                 verbosity='queryPlanner')),
+            ('delete tasks of a category',
+             lambda: self.db.command(
+                 'explain',
+                 {'delete': 'tasks',
+                  'deletes': [{'q': {'category_id': sample_id},
+                               'limit': 0}]},
+                 verbosity='queryPlanner')),
+            ('tasks changed since a time',
+             lambda: self.tasks.find({'updated_at': {'$gt': datetime.now()}})
+             .sort('updated_at', 1).explain()),
+        ]
+        plans = []
+        for shape, explain in shapes:
+            planner = explain().get('queryPlanner', {})
+            stages = list(_plan_stages(planner.get('winningPlan', {})))
+            index = next((stage.get('indexName') for stage in stages
+                          if stage['stage'] in ('IXSCAN', 'COUNT_SCAN')),
+                         None)
+            plans.append((shape, index))
+        return plans
+
+    def load_categories(self):
+        """All categories with their task counters, newest first"""
+        return list(self.categories.find({}, {'counts_pending': 0})
+                    .sort('created_at', -1))
+
+    def load_tasks(self, category_id):
+        """All tasks of a category, newest first"""
+        return list(self.tasks.find(
+            {'category_id': category_id}).sort('created_at', -1))
+
+    _PAGE_ORDER = [('created_at', -1), ('_id', -1)]
+
+    @staticmethod
+    def _page_query(category_id, after, before, completed):
+        query = {'category_id': category_id}
+        if completed is not None:
+            query['completed'] = completed
+        if after is not None:
+            query['$or'] = [
+                {'created_at': {'$lt': after[0]}},
+                {'created_at': after[0], '_id': {'$lt': after[1]}},
+            ]
+        elif before is not None:
+            query['$or'] = [
+                {'created_at': {'$gt': before[0]}},
+                {'created_at': before[0], '_id': {'$gt': before[1]}},
+            ]
+        return query
+
+    def load_tasks_page(self, category_id, after=None, before=None, skip=0,
+                        limit=50, completed=None):
+        """One page of a category's tasks, newest first
+
+        after/before are (created_at, _id) keys: the page starts right
+        after (older than) or ends right before (newer than) that task.
+        completed optionally restricts the page to done or undone tasks.
+        """
+        query = self._page_query(category_id, after, before, completed)
+        if before is not None:
+            order = [(key, 1) for key, _ in self._PAGE_ORDER]
+        else:
+            order = self._PAGE_ORDER
+        page = list(self.tasks.find(query).sort(order).skip(skip).limit(limit))
+        if before is not None:
+            page.reverse()
+        return page
+
+    def iter_categories(self, batch_size=1000):
+        """Stream every category, oldest first"""
+        return self.categories.find(
+            sort=[('created_at', 1)], batch_size=batch_size)
+
+    def iter_tasks(self, batch_size=1000):
+        """Stream every task in storage order, one batch in memory"""
+        return self.tasks.find(batch_size=batch_size)
+
+    def tasks_after(self, after=None, limit=1000):
+        """Up to limit tasks in _id order, starting after the task with
+        the _id after (from the first task when None)"""
+        query = {} if after is None else {'_id': {'$gt': after}}
+        return list(self.tasks.find(query).sort('_id', 1).limit(limit))
+
+    def task_position(self, task_id):
+        """Newest-first position of a task among its category's tasks,
+        None if it no longer exists"""
+        task = self.tasks.find_one({'_id': task_id},
+                                   {'category_id': 1, 'created_at': 1})
+        if task is None:
+            return None
+        return self.tasks.count_documents(self._page_query(
+            task['category_id'], None, (task['created_at'], task_id), None))
+
+    def repair_task_counts(self, category_ids=None):
+        """Recount the task counters of every category (or the given
+        ones) from their tasks with one aggregation, returns how many
+        categories were recounted
+
+        A category with a counter update still in flight (a
+        counts_pending token younger than COUNT_REPAIR_AFTER) is left
+        alone, since that update would be counted twice.
+        """
+        cutoff = ObjectId.from_datetime(
+            datetime.now(timezone.utc) - self.COUNT_REPAIR_AFTER)
+        match = {'counts_pending': {'$not': {'$gte': cutoff}}}
+        if category_ids is not None:
+            match['_id'] = {'$in': list(category_ids)}
+        recounted = self.categories.count_documents(match)
+        self.categories.aggregate([
+            {'$match': match},
+            {'$lookup': {
+                'from': 'tasks',
+                'let': {'category_id': '$_id'},
+                'pipeline': [
+                    {'$match': {'$expr': {
+                        '$eq': ['$category_id', '$$category_id']}}},
+                    {'$group': {
+                        '_id': None,
+                        'total': {'$sum': 1},
+                        'completed': {
+                            '$sum': {'$cond': ['$completed', 1, 0]}},
+                    }},
+                ],
+                'as': 'counts',
+            }},
+            # An empty category has no group: $sum of [] is 0
+            {'$project': {'task_count': {'$sum': '$counts.total'},
+                          'completed_count': {'$sum': '$counts.completed'}}},
+            # Drop only the dead tokens, a write may have marked the
+            # category since
+            {'$merge': {'into': 'categories', 'whenNotMatched': 'discard',
+                        'whenMatched': [{'$set': {
+                            'task_count': '$$new.task_count',
+                            'completed_count': '$$new.completed_count',
+                            'counts_pending': {'$filter': {
+                                'input': {'$ifNull': ['$counts_pending', []]},
+                                'cond': {'$gte': ['$$this', cutoff]}}},
+                        }}]}},
+        ])
+        return recounted
+
+    def ensure_task_counts(self):
+        """Recount the categories stored before they had counters and
+        those a write died halfway through (see _counted)"""
+        cutoff = ObjectId.from_datetime(
+            datetime.now(timezone.utc) - self.COUNT_REPAIR_AFTER)
+        stale = self.categories.distinct('_id', {'$or': [
+            {'task_count': {'$exists': False}},
+            {'counts_pending': {'$lt': cutoff}}]})
+        if stale:
+            self.repair_task_counts(stale)
+
+    # Every write stamps updated_at and every delete leaves a tombstone
+    # in deletions, so other instances can poll for changes
+
+    @staticmethod
+    def _stamped(fields):
+        return dict(fields, updated_at=_utc_now())
+
+    @staticmethod
+    def _tombstone(collection, selector):
+        return {'collection': collection, 'selector': selector,
+                'deleted_at': _utc_now()}
+
+    # Each category document carries task_count and completed_count.
+    # Task writes $inc them by what the write did, read from the task as
+    # the write found it (find_one_and_*) or from the matched and deleted
+    # counts of a write per completion state, so concurrent writers
+    # never count the same change twice. Before the write the categories
+    # get a token in counts_pending, pulled along with the $inc; a token
+    # still there after COUNT_REPAIR_AFTER belongs to a writer that died
+    # in between, and ensure_task_counts() recounts its categories.
+    COUNTERS = ('task_count', 'completed_count')
+    COUNT_REPAIR_AFTER = timedelta(minutes=10)
+    COUNT_FIELDS = {'category_id': 1, 'completed': 1}
+
+    @staticmethod
+    def _count(changes, category_id, completed, n):
+        counts = changes.setdefault(category_id, [0, 0])
+        counts[0] += n
+        counts[1] += n if completed else 0
+
+    @staticmethod
+    def _changes_counts(method, args):
+        """Whether a task write can change the counters"""
+        if method in ('update_task', 'update_tasks'):
+            return bool({'completed', 'category_id'} & set(args[-1]))
+        return method in ('insert_task', 'delete_task', 'delete_tasks')
+
+    def _counted(self, category_ids, write):
+        """Run write(changes), which fills changes with {category_id:
+        [tasks, completed]}, and add them to the counters
+
+        category_ids are the categories the write may change, marked
+        pending until their counters are updated.
+        """
+        token, changes = ObjectId(), {}
+        self.categories.update_many({'_id': {'$in': list(category_ids)}},
+                                    {'$push': {'counts_pending': token}})
+        try:
+            write(changes)
+        except WriteError:
+            # Refused, so the writes before it are all there is to count
+            self._add_counts(changes, category_ids, token)
+            raise
+        except Exception:
+            # It may have been applied: left pending for a recount
+            try:
+                self._add_counts(changes, (), None)
+            except PyMongoError:
+                pass
+            raise
+        self._add_counts(changes, category_ids, token)
+
+    def _add_counts(self, changes, category_ids, token):
+        """$inc the changes and pull token from the marked categories, one
+        update_many per distinct change"""
+        by_change = {}
+        for category_id, counts in changes.items():
+            if counts != [0, 0]:
+                by_change.setdefault(tuple(counts), []).append(category_id)
+        unchanged = [category_id for category_id in category_ids
+                     if category_id not in changes
+                     or changes[category_id] == [0, 0]]
+        pull = {} if token is None else {
+            '$pull': {'counts_pending': token}}
+        for counts, ids in by_change.items():
+            self.categories.update_many(
+                {'_id': {'$in': ids}},
+                {'$inc': dict(zip(self.COUNTERS, counts)), **pull})
+        if unchanged and pull:
+            self.categories.update_many({'_id': {'$in': unchanged}}, pull)
+
+    def _task_write(self, method, args, changes):
+        """Apply one insert_task, update_task or delete_task, counting
+        the task as it was before and after"""
+        if method == 'insert_task':
+            new = args[0]
+            old = self.tasks.find_one_and_replace(
+                {'_id': new['_id']}, self._stamped(new),
+                projection=self.COUNT_FIELDS, upsert=True)
+        elif method == 'update_task':
+            old = self.tasks.find_one_and_update(
+                {'_id': args[0]}, {'$set': self._stamped(args[1])},
+                projection=self.COUNT_FIELDS)
+            new = None if old is None else dict(old, **args[1])
+        else:
+            old = self.tasks.find_one_and_delete(
+                {'_id': args[0]}, projection=self.COUNT_FIELDS)
+            new = None
+        if old is not None:
+            self._count(changes, old['category_id'], old.get('completed'),
+                        -1)
+        if new is not None:
+            self._count(changes, new['category_id'], new['completed'], 1)
+
+    def _selector_write(self, method, args, category_ids, changes):
+        """Apply one update_tasks or delete_tasks, one write per category
+        and completion state so the matched and deleted counts say what
+        changed"""
+        selector = args[0]
+        query = self._selector_query(selector)
+        states = ([selector['completed']]
+                  if selector.get('completed') is not None
+                  else [False, True])
+        for category_id in category_ids:
+            for completed in states:
+                scoped = dict(query, category_id=category_id,
+                              completed=completed)
+                if method == 'delete_tasks':
+                    n = self.tasks.delete_many(scoped).deleted_count
+                    self._count(changes, category_id, completed, -n)
+                    continue
+                fields = args[1]
+                n = self.tasks.update_many(
+                    scoped, {'$set': self._stamped(fields)}).matched_count
+                self._count(changes, category_id, completed, -n)
+                self._count(changes, fields.get('category_id', category_id),
+                            fields.get('completed', completed), n)
+
+    def _apply_counted(self, segment, tombstones):
+        """Apply a segment of writes that change the counters (see
+        _segments): a run of single task writes or one selector write"""
+        method, args = segment[0]
+        if method.endswith('_tasks'):
+            selector = args[0]
+            if 'category_id' in selector:
+                category_ids = [selector['category_id']]
+            else:
+                category_ids = self.tasks.distinct(
+                    'category_id', self._selector_query(selector))
+            marked = set(category_ids)
+            if method == 'update_tasks' and 'category_id' in args[1]:
+                marked.add(args[1]['category_id'])
+            self._counted(marked, lambda changes: self._selector_write(
+                method, args, category_ids, changes))
+            if method == 'delete_tasks':
+                tombstones.append(self._tombstone('tasks', selector))
+            return
+
+        # Inserted tasks are new, the others are found where they are
+        marked = {args[0]['category_id'] for method, args in segment
+                  if method == 'insert_task'}
+        marked.update(args[1]['category_id'] for method, args in segment
+                      if method == 'update_task' and 'category_id' in args[1])
+        ids = [args[0] for method, args in segment
+               if method != 'insert_task']
+        if ids:
+            marked.update(self.tasks.distinct('category_id',
+                                              {'_id': {'$in': ids}}))
+
+        def write(changes):
+            for method, args in segment:
+                self._task_write(method, args, changes)
+
+        self._counted(marked, write)
+        tombstones.extend(self._tombstone('tasks', {'ids': [args[0]]})
+                          for method, args in segment
+                          if method == 'delete_task')
+
+    # Single inserts are upserts, so replaying a journaled write that
+    # already reached the database is harmless
+
+    def insert_category(self, category):
+        # Upserted in place, so a replay keeps the counters
+        self.categories.update_one(*self._category_upsert(category),
+                                   upsert=True)
+
+    def _category_upsert(self, category):
+        """(filter, update) upserting a category without touching the
+        counters of one that exists"""
+        fields = {key: value for key, value in self._stamped(category).items()
+                  if key != '_id' and key not in self.COUNTERS}
+        return ({'_id': category['_id']},
+                {'$set': fields,
+                 '$setOnInsert': dict.fromkeys(self.COUNTERS, 0)})
+
+    def insert_categories(self, categories):
+        """Insert a batch of categories with one round trip"""
+        if categories:
+            self.categories.insert_many(
+                [dict(self._stamped(category), task_count=0,
+                      completed_count=0) for category in categories],
+                ordered=False)
+
+    def insert_tasks(self, tasks):
+        """Insert a batch of tasks with one round trip, then count them"""
+        if tasks:
+            def write(changes):
+                self.tasks.insert_many(
+                    [self._stamped(task) for task in tasks], ordered=False)
+                for task in tasks:
+                    self._count(changes, task['category_id'],
+                                task['completed'], 1)
+
+            self._counted({task['category_id'] for task in tasks}, write)
+
+    def update_category(self, category_id, fields):
+        self.categories.update_one({'_id': category_id},
+                                   {'$set': self._stamped(fields)})
+
+    def delete_category(self, category_id):
+        """Delete a category and all its tasks"""
+        # Its counters go away with it
+        self.categories.delete_one({'_id': category_id})
+        self.tasks.delete_many({'category_id': category_id})
+        self.deletions.insert_one(
+            self._tombstone('categories', {'ids': [category_id]}))
+
+    def _write_counted(self, method, *args):
+        tombstones = []
+        self._apply_counted([(method, args)], tombstones)
+        if tombstones:
+            self.deletions.insert_many(tombstones)
+
+    def insert_task(self, task):
+        self._write_counted('insert_task', task)
+
+    def update_task(self, task_id, fields):
+        if self._changes_counts('update_task', (task_id, fields)):
+            self._write_counted('update_task', task_id, fields)
+        else:
+            self.tasks.update_one({'_id': task_id},
+                                  {'$set': self._stamped(fields)})
+
+    def delete_task(self, task_id):
+        self._write_counted('delete_task', task_id)
+
+    @staticmethod
+    def _selector_query(selector):
+        """Query for a bulk selector: {'ids': [...]} or {'category_id',
+        optional 'completed', optional 'exclude': [...]}"""
+        if 'ids' in selector:
+            return {'_id': {'$in': list(selector['ids'])}}
+        query = {'category_id': selector['category_id']}
+        if selector.get('completed') is not None:
+            query['completed'] = selector['completed']
+        if selector.get('exclude'):
+            query['_id'] = {'$nin': list(selector['exclude'])}
+        return query
+
+    def update_tasks(self, selector, fields):
+        """Update every selected task, with one update_many per category
+        and completion state when the counters change"""
+        if self._changes_counts('update_tasks', (selector, fields)):
+            self._write_counted('update_tasks', selector, fields)
+        else:
+            self.tasks.update_many(self._selector_query(selector),
+                                   {'$set': self._stamped(fields)})
+
+    def delete_tasks(self, selector):
+        """Delete every selected task, with one delete_many per category
+        and completion state"""
+        self._write_counted('delete_tasks', selector)
+
+    def _bulk_requests(self, method, args, tombstones):
+        """[(collection, bulk_write request)] for one write method call"""
+        kind, _, noun = method.partition('_')
+        collection = self.categories if noun == 'category' else self.tasks
+        if method == 'insert_category':
+            return [(collection, UpdateOne(*self._category_upsert(args[0]),
+                                           upsert=True))]
+        if kind == 'insert':
+            doc = self._stamped(args[0])
+            return [(collection,
+                     ReplaceOne({'_id': doc['_id']}, doc, upsert=True))]
+        if noun == 'tasks':
+            query, selector = self._selector_query(args[0]), args[0]
+        else:
+            query, selector = {'_id': args[0]}, {'ids': [args[0]]}
+        if kind == 'update':
+            update = UpdateMany if noun == 'tasks' else UpdateOne
+            return [(collection,
+                     update(query, {'$set': self._stamped(args[1])}))]
+        tombstones.append(self._tombstone(collection.name, selector))
+        if noun == 'category':
+            return [(collection, DeleteOne(query)),
+                    (self.tasks, DeleteMany({'category_id': args[0]}))]
+        delete = DeleteMany if noun == 'tasks' else DeleteOne
+        return [(collection, delete(query))]
+
+    @classmethod
+    def _segments(cls, writes):
+        """Split writes into (counted, segment): runs of writes that
+        leave the counters alone, runs of single task writes that change
+        them, and selector writes that change them, which stand alone"""
+        segment, counted = [], False
+        for method, args in writes:
+            changes = cls._changes_counts(method, args)
+            alone = changes and method.endswith('_tasks')
+            if segment and (changes != counted or alone):
+                yield counted, segment
+                segment = []
+            segment.append((method, args))
+            counted = changes
+            if alone:
+                yield counted, segment
+                segment = []
+        if segment:
+            yield counted, segment
+
+    def _bulk_write(self, writes, tombstones):
+        """One ordered bulk_write per run of writes to the same
+        collection"""
+        runs = []
+        for method, args in writes:
+            for collection, request in self._bulk_requests(
+                    method, args, tombstones):
+                if runs and runs[-1][0] is collection:
+                    runs[-1][1].append(request)
+                else:
+                    runs.append((collection, [request]))
+        for collection, requests in runs:
+            collection.bulk_write(requests, ordered=True)
+
+    def apply_writes(self, writes):
+        """Apply (method, args) writes in order: one ordered bulk_write
+        per run of writes to the same collection that leave the counters
+        alone, the writes that change them along with their counter
+        updates (see _segments), then the tombstones
+
+        Raises WriteRejected when the server refuses one of them.
+        """
+        tombstones = []
+        try:
+            for counted, segment in self._segments(writes):
+                if counted:
+                    self._apply_counted(segment, tombstones)
+                else:
+                    self._bulk_write(segment, tombstones)
+        except BulkWriteError as e:
+            raise WriteRejected(e.details.get('writeErrors')) from e
+        except WriteError as e:
+            raise WriteRejected([e.details]) from e
+        if tombstones:
+            self.deletions.insert_many(tombstones)
+
+    def documents(self, collection, ids):
+        """{_id: document} for the ids that still exist in a collection"""
+        return {doc['_id']: doc for doc in self.db[collection].find(
+            {'_id': {'$in': list(ids)}})}
+
+    def change_feed(self, deliver):
+        """A ChangeFeed delivering other instances' changes"""
+        return ChangeFeed(self, deliver)
+
+    def open_change_stream(self, resume_after=None):
+        """Change stream over categories and tasks (needs a replica set)"""
+        return self.db.watch(
+            [{'$match': {'ns.coll': {'$in': ['categories', 'tasks']}}}],
+            full_document='updateLookup', resume_after=resume_after,
+            max_await_time_ms=1000)
+
+    @staticmethod
+    def normalize_change(event):
+        """A change stream event as a sync change, None to ignore it
+
+        Changes are ('upsert', collection, document) or
+        ('delete', collection, selector).
+        """
+        collection = event['ns']['coll']
+        if event['operationType'] in ('insert', 'update', 'replace'):
+            # None when the document was deleted again since
+            if event.get('fullDocument') is not None:
+                return ('upsert', collection, event['fullDocument'])
+        elif event['operationType'] == 'delete':
+            return ('delete', collection,
+                    {'ids': [event['documentKey']['_id']]})
+        return None
+
+    def sync_start(self):
+        """Where the first changes_since() should start"""
+        return _utc_now()
+
+    def changes_since(self, since):
+        """Changes written since a sync_start()/previous result, for
+        servers without change streams.
+
+        Returns ([(key, change)], next since). Changes up to SYNC_OVERLAP
+        before since are read again, for writers whose clocks lag; key
+        identifies a change so callers can skip the ones they have seen.
+        """
+        start = since - self.SYNC_OVERLAP
+        latest = since
+        changes = []
+        for collection in ('categories', 'tasks'):
+            for doc in self.db[collection].find(
+                    {'updated_at': {'$gt': start}}).sort('updated_at', 1):
+                changes.append(((collection, doc['_id'], doc['updated_at']),
+                                ('upsert', collection, doc)))
+                latest = max(latest, doc['updated_at'])
+        for tombstone in self.deletions.find(
+                {'deleted_at': {'$gt': start}}).sort('deleted_at', 1):
+            changes.append((('deletions', tombstone['_id']),
+                            ('delete', tombstone['collection'],
+                             tombstone['selector'])))
+            latest = max(latest, tombstone['deleted_at'])
+        return changes, latest
+
+    def close(self):
+        self.client.close()
+
+
+class SQLiteStorage:
+    """Stores categories and tasks in a local SQLite file
+
+    Documents keep the same shape as in MongoDB (ObjectId _id and
+    category_id, datetime created_at), so the UI does not care which
+    backend it talks to.
+    """
+
+    name = 'SQLite'
+    # Single-user: no other instances to follow
+    supports_sync = False
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS categories (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            task_count INTEGER NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            category_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        );
+        -- Ids a select-all bulk write leaves out, filled per statement
+        CREATE TEMP TABLE IF NOT EXISTS excluded_tasks (
+            id TEXT PRIMARY KEY
+        );
+    '''
+
+    # Keep each category's task_count and completed_count in step with
+    # its tasks, in the transaction that changes them. With recursive
+    # triggers on, INSERT OR REPLACE of a task counts its old row out.
+    COUNT_TRIGGERS = [
+        '''CREATE TRIGGER IF NOT EXISTS tasks_count_insert
+        AFTER INSERT ON tasks BEGIN
+            UPDATE categories SET task_count = task_count + 1,
+                completed_count = completed_count + NEW.completed
+            WHERE id = NEW.category_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_count_delete
+        AFTER DELETE ON tasks BEGIN
+            UPDATE categories SET task_count = task_count - 1,
+                completed_count = completed_count - OLD.completed
+            WHERE id = OLD.category_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_count_update
+        AFTER UPDATE OF completed, category_id ON tasks
+        WHEN OLD.completed != NEW.completed
+            OR OLD.category_id != NEW.category_id BEGIN
+            UPDATE categories SET task_count = task_count - 1,
+                completed_count = completed_count - OLD.completed
+            WHERE id = OLD.category_id;
+            UPDATE categories SET task_count = task_count + 1,
+                completed_count = completed_count + NEW.completed
+            WHERE id = NEW.category_id;
+        END''',
+    ]
+    # Categories are upserted in place so their counters survive
+    CATEGORY_UPSERT = (' ON CONFLICT (id) DO UPDATE SET '
+                       'name = excluded.name, created_at = excluded.created_at')
+
+    # Indexes backing every query shape the app runs
+    INDEXES = [
+        'CREATE INDEX IF NOT EXISTS categories_created_at '
+        'ON categories (created_at)',
+        # load_tasks and keyset pages: category_id, then page order
+        'CREATE INDEX IF NOT EXISTS tasks_category_created_id '
+        'ON tasks (category_id, created_at, id)',
+        # progress counts, delete_category and filtered pages
+        'CREATE INDEX IF NOT EXISTS tasks_category_completed_created_id '
+        'ON tasks (category_id, completed, created_at, id)',
+    ]
+    # Superseded indexes dropped by ensure_indexes()
+    LEGACY_INDEXES = ['tasks_category_created_at', 'tasks_category_completed']
+
+    # Query shapes checked by query_plans(), with sample parameters
+    QUERY_SHAPES = [
+        ('categories sorted by created_at',
+         'SELECT id FROM categories ORDER BY created_at DESC', ()),
+        ('tasks of a category sorted by created_at',
+         'SELECT id FROM tasks WHERE category_id = ? '
+         'ORDER BY created_at DESC', ('',)),
+        ('page of undone tasks after a key',
+         'SELECT id FROM tasks WHERE category_id = ? AND completed = 0 '
+         'AND (created_at, id) < (?, ?) '
+         'ORDER BY created_at DESC, id DESC LIMIT 50', ('', '', '')),
+        ('completed tasks of a category',
+         'SELECT COUNT(*) FROM tasks WHERE category_id = ? AND completed = 1',
+         ('',)),
+        ('delete tasks of a category',
+         'DELETE FROM tasks WHERE category_id = ?', ('',)),
+    ]
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        # All queries run on the storage worker thread, one at a time
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.operations = OperationCounter()
+        self._last_statement = None
+        self.conn.set_trace_callback(self._count_statement)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA recursive_triggers=ON')
+        self.conn.executescript(self.SCHEMA)
+        self._depth = 0  # Nesting of _transaction() blocks
+        self.ensure_task_counts()
+
+    def ensure_task_counts(self):
+        """Add the counter columns and triggers to files created before
+        them, counting every category's tasks once"""
+        columns = {row[1] for row in self.conn.execute(
+            'PRAGMA table_info(categories)')}
+        with self._transaction():
+            # sqlite3 only begins a transaction by itself before DML
+            if not self.conn.in_transaction:
+                self.conn.execute('BEGIN')
+            if 'task_count' not in columns:
+                for column in ('task_count', 'completed_count'):
+                    self.conn.execute(
+                        f'ALTER TABLE categories ADD COLUMN {column} '
+                        'INTEGER NOT NULL DEFAULT 0')
+                self.repair_task_counts()
+            # execute(), not executescript(), which would commit first
+            for statement in self.COUNT_TRIGGERS:
+                self.conn.execute(statement)
+
+    @contextmanager
+    def _transaction(self):
+        """Commit when the outermost block ends, roll back on errors"""
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if not self._depth:
+                self.conn.rollback()
+            raise
+        self._depth -= 1
+        if not self._depth:
+            self.conn.commit()
+
+    def _count_statement(self, statement):
+        # Transaction control is not an operation of its own, and each
+        # trigger step is traced again as the statement that fired it
+        repeat, self._last_statement = (
+            statement == self._last_statement, statement)
+        if not repeat and not statement.startswith(
+                ('BEGIN', 'COMMIT', 'ROLLBACK')):
+            self.operations.add()
+
+    def ensure_indexes(self):
+        """Create the declared indexes (a no-op when they exist)"""
+        with self.conn:
+            for statement in self.INDEXES:
+                self.conn.execute(statement)
+            for name in self.LEGACY_INDEXES:
+                self.conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+    def query_plans(self):
+        """Explain each query shape, returns [(shape, index or None)]
+
+        A shape only counts as index-backed when no step scans a whole
+        table and no temporary b-tree is needed for sorting.
+        """
+        plans = []
+        for shape, sql, params in self.QUERY_SHAPES:
+            details = [row[-1] for row in self.conn.execute(
+                'EXPLAIN QUERY PLAN ' + sql, params)]
+            index = None
+            for detail in details:
+                if 'INDEX' in detail:
+                    index = detail.split('INDEX ', 1)[1].split(' ')[0]
+            full_scan = any(detail.startswith('SCAN') and 'INDEX' not in detail
+                            for detail in details)
+            temp_sort = any('TEMP B-TREE' in detail for detail in details)
+            plans.append((shape, None if full_scan or temp_sort else index))
+        return plans
+
+    @staticmethod
+    def _category(row):
+        category = {
+            '_id': ObjectId(row[0]),
+            'name': row[1],
+            'created_at': datetime.fromisoformat(row[2]),
+        }
+        if len(row) > 3:
+            category['task_count'], category['completed_count'] = row[3:5]
+        return category
+
+    @staticmethod
+    def _task(row):
+        return {
+            '_id': ObjectId(row[0]),
+            'category_id': ObjectId(row[1]),
+            'name': row[2],
+            'completed': bool(row[3]),
+            'created_at': datetime.fromisoformat(row[4]),
+        }
+
+    def _update(self, table, doc_id, fields):
+        columns = {'name': 'name', 'completed': 'completed'}
+        assignments = ', '.join(f'{columns[key]} = ?' for key in fields)
+        values = [int(value) if key == 'completed' else value
+                  for key, value in fields.items()]
+        with self._transaction():
+            self.conn.execute(
+                f'UPDATE {table} SET {assignments} WHERE id = ?',
+                values + [str(doc_id)])
+
+    def load_categories(self):
+        """All categories with their task counters, newest first"""
+        rows = self.conn.execute(
+            'SELECT id, name, created_at, task_count, completed_count '
+            'FROM categories ORDER BY created_at DESC')
+        return [self._category(row) for row in rows]
+
+    def load_tasks(self, category_id):
+        """All tasks of a category, newest first"""
+        rows = self.conn.execute(
+            'SELECT id, category_id, name, completed, created_at FROM tasks '
+            'WHERE category_id = ? ORDER BY created_at DESC',
+            (str(category_id),))
+        return [self._task(row) for row in rows]
+
+    def load_tasks_page(self, category_id, after=None, before=None, skip=0,
+                        limit=50, completed=None):
+        """One page of a category's tasks, newest first
+
+        after/before are (created_at, _id) keys: the page starts right
+        after (older than) or ends right before (newer than) that task.
+        completed optionally restricts the page to done or undone tasks.
+        """
+        where = ['category_id = ?']
+        params = [str(category_id)]
+        if completed is not None:
+            where.append('completed = ?')
+            params.append(int(completed))
+        order = 'DESC'
+        if after is not None:
+            where.append('(created_at, id) < (?, ?)')
+            params += [_timestamp(after[0]), str(after[1])]
+        elif before is not None:
+            where.append('(created_at, id) > (?, ?)')
+            params += [_timestamp(before[0]), str(before[1])]
+            order = 'ASC'
+        rows = self.conn.execute(
+            'SELECT id, category_id, name, completed, created_at FROM tasks '
+            f'WHERE {" AND ".join(where)} '
+            f'ORDER BY created_at {order}, id {order} LIMIT ? OFFSET ?',
+            params + [limit, skip])
+        page = [self._task(row) for row in rows]
+        if before is not None:
+            page.reverse()
+        return page
+
+    def _iter_rows(self, query, convert, batch_size):
+        cursor = self.conn.cursor()
+        cursor.arraysize = batch_size
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            for row in rows:
+                yield convert(row)
+
+    def iter_categories(self, batch_size=1000):
+        """Stream every category, oldest first"""
+        return self._iter_rows(
+            'SELECT id, name, created_at FROM categories '
+            'ORDER BY created_at', self._category, batch_size)
+
+    def iter_tasks(self, batch_size=1000):
+        """Stream every task in storage order, one batch in memory"""
+        return self._iter_rows(
+            'SELECT id, category_id, name, completed, created_at FROM tasks',
+            self._task, batch_size)
+
+    def tasks_after(self, after=None, limit=1000):
+        """Up to limit tasks in _id order, starting after the task with
+        the _id after (from the first task when None)"""
+        rows = self.conn.execute(
+            'SELECT id, category_id, name, completed, created_at FROM tasks '
+            'WHERE id > ? ORDER BY id LIMIT ?',
+            ('' if after is None else str(after), limit))
+        return [self._task(row) for row in rows]
+
+    def task_position(self, task_id):
+        """Newest-first position of a task among its category's tasks,
+        None if it no longer exists"""
+        row = self.conn.execute(
+            'SELECT category_id, created_at FROM tasks WHERE id = ?',
+            (str(task_id),)).fetchone()
+        if row is None:
+            return None
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM tasks WHERE category_id = ? '
+            'AND (created_at, id) > (?, ?)',
+            (row[0], row[1], str(task_id))).fetchone()[0]
+
+    def repair_task_counts(self):
+        """Recount every category's task counters from its tasks with one
+        statement, returns how many categories were recounted"""
+        with self._transaction():
+            return self.conn.execute(
+                'UPDATE categories SET '
+                'task_count = (SELECT COUNT(*) FROM tasks '
+                'WHERE category_id = categories.id), '
+                'completed_count = (SELECT COUNT(*) FROM tasks '
+                'WHERE category_id = categories.id AND completed = 1)'
+            ).rowcount
+
+    # Single inserts are upserts, so replaying a journaled write that
+    # already reached the database is harmless
+
+    def insert_category(self, category):
+        self._insert_categories([category], 'INSERT OR REPLACE')
+
+    def insert_categories(self, categories):
+        """Insert a batch of categories in one transaction"""
+        self._insert_categories(categories, 'INSERT')
+
+    def _insert_categories(self, categories, verb):
+        upsert = ''
+        if verb == 'INSERT OR REPLACE':
+            verb, upsert = 'INSERT', self.CATEGORY_UPSERT
+        with self._transaction():
+            self.conn.executemany(
+                f'{verb} INTO categories (id, name, created_at) '
+                f'VALUES (?, ?, ?){upsert}',
+                [(str(category['_id']), category['name'],
+                  _timestamp(category['created_at']))
+                 for category in categories])
+
+    def update_category(self, category_id, fields):
+        self._update('categories', category_id, fields)
+
+    def delete_category(self, category_id):
+        """Delete a category and all its tasks"""
+        with self._transaction():
+            self.conn.execute('DELETE FROM categories WHERE id = ?',
+                              (str(category_id),))
+            self.conn.execute('DELETE FROM tasks WHERE category_id = ?',
+                              (str(category_id),))
+
+    def insert_task(self, task):
+        self._insert_tasks([task], 'INSERT OR REPLACE')
+
+    def insert_tasks(self, tasks):
+        """Insert a batch of tasks in one transaction"""
+        self._insert_tasks(tasks, 'INSERT')
+
+    def _insert_tasks(self, tasks, verb):
+        with self._transaction():
+            self.conn.executemany(
+                f'{verb} INTO tasks (id, category_id, name, completed, '
+                'created_at) VALUES (?, ?, ?, ?, ?)',
+                [(str(task['_id']), str(task['category_id']), task['name'],
+                  int(task['completed']), _timestamp(task['created_at']))
+                 for task in tasks])
+
+    def update_task(self, task_id, fields):
+        self._update('tasks', task_id, fields)
+
+    def delete_task(self, task_id):
+        with self._transaction():
+            self.conn.execute('DELETE FROM tasks WHERE id = ?',
+                              (str(task_id),))
+
+    # Ids per IN (...) list, below SQLite's bound parameter limit
+    SELECTOR_CHUNK = 500
+
+    def _selector_clauses(self, selector):
+        """(WHERE clause, params) pairs for a bulk selector, see
+        MongoStorage._selector_query"""
+        if 'ids' in selector:
+            ids = [str(task_id) for task_id in selector['ids']]
+            for start in range(0, len(ids), self.SELECTOR_CHUNK):
+                chunk = ids[start:start + self.SELECTOR_CHUNK]
+                yield f'id IN ({", ".join("?" * len(chunk))})', chunk
+            return
+        where = ['category_id = ?']
+        params = [str(selector['category_id'])]
+        if selector.get('completed') is not None:
+            where.append('completed = ?')
+            params.append(int(selector['completed']))
+        exclude = selector.get('exclude')
+        if exclude:
+            # Any number of exclusions, without hitting the bound
+            # parameter limit: callers run this inside their transaction
+            self.conn.execute('DELETE FROM excluded_tasks')
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO excluded_tasks (id) VALUES (?)',
+                ((str(task_id),) for task_id in exclude))
+            where.append('id NOT IN (SELECT id FROM excluded_tasks)')
+        yield ' AND '.join(where), params
+
+    def update_tasks(self, selector, fields):
+        """Update every selected task in one transaction"""
+        columns = {'name': 'name', 'completed': 'completed'}
+        assignments = ', '.join(f'{columns[key]} = ?' for key in fields)
+        values = [int(value) if key == 'completed' else value
+                  for key, value in fields.items()]
+        with self._transaction():
+            for where, params in self._selector_clauses(selector):
+                self.conn.execute(
+                    f'UPDATE tasks SET {assignments} WHERE {where}',
+                    values + params)
+
+    def delete_tasks(self, selector):
+        """Delete every selected task in one transaction"""
+        with self._transaction():
+            for where, params in self._selector_clauses(selector):
+                self.conn.execute(f'DELETE FROM tasks WHERE {where}', params)
+
+    def apply_writes(self, writes):
+        """Apply (method, args) writes in order in one transaction
+
+        Raises WriteRejected when a constraint refuses one of them.
+        """
+        try:
+            with self._transaction():
+                for method, args in writes:
+                    getattr(self, method)(*args)
+        except sqlite3.IntegrityError as e:
+            raise WriteRejected(str(e)) from e
+
+    def close(self):
+        self.conn.close()
+
+
+def open_storage():
+    """Open the backend selected by the TODO_STORAGE environment variable
+
+    TODO_STORAGE=mongo (default) uses TODO_MONGO_URI,
+    TODO_STORAGE=sqlite uses the file at TODO_SQLITE_PATH.
+    """
+    backend = os.environ.get('TODO_STORAGE', 'mongo').lower()
+    if backend == 'sqlite':
+        storage = SQLiteStorage(
+            os.environ.get('TODO_SQLITE_PATH', DEFAULT_SQLITE_PATH))
+    elif backend == 'mongo':
+        storage = MongoStorage(
+            os.environ.get('TODO_MONGO_URI', DEFAULT_MONGO_URI))
+    else:
+        raise ValueError(f"Unknown TODO_STORAGE backend: {backend}")
+    storage.ensure_indexes()
+    return storage
+
+
+def check_indexes(storage):
+    """Print the query plan of each query shape, returns True if all
+    of them are backed by an index"""
+    all_indexed = True
+    for shape, index in storage.query_plans():
+        if index:
+            print(f"✓ {shape}: {index}")
+        else:
+            all_indexed = False
+            print(f"✗ {shape}: not index-backed")
+    return all_indexed
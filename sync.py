@@ -0,0 +1,98 @@
+"""
+Change feed for the Pokemon Todo List
+Follows the edits other app instances make to a shared database
+"""
+import threading
+
+
+class ChangeFeed:
+    """Delivers other instances' changes from a background thread
+
+    Tails a MongoDB change stream when the server has one (replica sets)
+    and otherwise polls updated_at and the deletion tombstones every
+    poll_interval seconds. deliver(changes) is called from the feed thread
+    with a list of changes:
+
+        ('upsert', collection, document)
+        ('delete', collection, selector)
+        ('reload',)  -- changes may have been missed, reload everything
+
+    The app's own writes come back through the feed as well, so applying
+    a change has to be idempotent.
+    """
+
+    RETRY_SECONDS = 5
+
+    def __init__(self, storage, deliver, poll_interval=2.0):
+        self.storage = storage
+        self.deliver = deliver
+        self.poll_interval = poll_interval
+        self.mode = None  # 'stream' or 'poll' once running
+        self._stop = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name='change-feed', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self.thread.join(timeout)
+
+    def _run(self):
+        since = self.storage.sync_start()
+        try:
+            stream = self.storage.open_change_stream()
+        except Exception as e:
+            print(f"⚠ Change streams unavailable ({e}), "
+                  f"polling for changes every {self.poll_interval:g}s")
+            self._poll(since)
+        else:
+            print("✓ Following changes with a change stream")
+            self._follow(stream)
+
+    def _follow(self, stream):
+        self.mode = 'stream'
+        while not self._stop.is_set():
+            try:
+                with stream:
+                    while not self._stop.is_set():
+                        # Waits up to the stream's max_await_time_ms
+                        event = stream.try_next()
+                        change = event and self.storage.normalize_change(event)
+                        if change:
+                            self.deliver([change])
+                    return
+            except Exception as e:
+                print(f"✗ Change stream failed: {e}")
+                resume_token = stream.resume_token
+            stream = self._reopen(resume_token)
+
+    def _reopen(self, resume_token):
+        """Resume a failed stream, or start over and ask for a reload"""
+        while not self._stop.wait(self.RETRY_SECONDS):
+            try:
+                return self.storage.open_change_stream(resume_token)
+            except Exception:
+                pass
+            try:
+                stream = self.storage.open_change_stream()
+            except Exception as e:
+                print(f"✗ Change stream failed: {e}")
+                continue
+            self.deliver([('reload',)])
+            return stream
+
+    def _poll(self, since):
+        self.mode = 'poll'
+        seen = set()  # Keys of the last poll, which overlaps this one
+        while not self._stop.wait(self.poll_interval):
+            try:
+                keyed, since = self.storage.changes_since(since)
+            except Exception as e:
+                print(f"✗ Polling for changes failed: {e}")
+                continue
+            changes = [change for key, change in keyed if key not in seen]
+            seen = {key for key, change in keyed}
+            if changes:
+                self.deliver(changes)
@@ -0,0 +1,125 @@
+"""
+JSONL export and import for the Pokemon Todo List
+Moves goals and tasks between machines or backends in constant memory:
+documents are streamed one at a time and written in fixed-size batches.
+
+Each line is one document. Goals come before the tasks that use them:
+
+    {"type": "category", "_id": "...", "name": "...", "created_at": "..."}
+    {"type": "task", "_id": "...", "category_id": "...", "name": "...",
+     "completed": false, "created_at": "..."}
+"""
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+BATCH_SIZE = 1000
+# The fields of each document type: the only ones exported, and the
+# ones an import needs
+FIELDS = {
+    'category': ('_id', 'name', 'created_at'),
+    'task': ('_id', 'category_id', 'name', 'completed', 'created_at'),
+}
+
+
+def _encode(kind, doc):
+    # Storage-internal fields (updated_at, task counters) stay behind
+    line = {'type': kind}
+    for key in FIELDS[kind]:
+        value = doc[key]
+        if isinstance(value, ObjectId):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat(timespec='microseconds')
+        line[key] = value
+    return json.dumps(line, ensure_ascii=False)
+
+
+def export_jsonl(storage, path, batch_size=BATCH_SIZE):
+    """Write every goal, then every task, returns (goals, tasks)"""
+    counts = {'category': 0, 'task': 0}
+    with open(path, 'w', encoding='utf-8') as f:
+        for kind, docs in (('category', storage.iter_categories(batch_size)),
+                           ('task', storage.iter_tasks(batch_size))):
+            for doc in docs:
+                f.write(_encode(kind, doc) + '\n')
+                counts[kind] += 1
+    return counts['category'], counts['task']
+
+
+def _read_jsonl(path):
+    """Yield (type, document, created_at) for each line of an export"""
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                doc = json.loads(line)
+                if not isinstance(doc, dict):
+                    raise ValueError("not an object")
+                kind = doc.pop('type')
+                if kind not in FIELDS:
+                    raise ValueError(f"unknown type {kind!r}")
+                missing = [key for key in FIELDS[kind] if key not in doc]
+                if missing:
+                    raise ValueError(f"missing {', '.join(missing)}")
+                created_at = datetime.fromisoformat(doc['created_at'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(
+                    f"{path}:{number}: invalid line: {e}") from e
+            yield kind, doc, created_at
+
+
+def import_jsonl(storage, path, batch_size=BATCH_SIZE):
+    """Add the goals and tasks of an export, returns (goals, tasks, skipped)
+
+    Every imported document gets a fresh _id, so importing into a
+    database that already holds the same data never collides, and
+    category_id is remapped to the new goal ids. Only that id map is
+    kept in memory. Tasks whose goal is not in the file are skipped.
+    The whole file is checked before anything is written, so an invalid
+    line imports nothing.
+    """
+    for _ in _read_jsonl(path):
+        pass
+
+    category_ids = {}
+    categories, tasks = [], []
+    counts = {'category': 0, 'task': 0, 'skipped': 0}
+
+    def flush_categories():
+        storage.insert_categories(categories)
+        counts['category'] += len(categories)
+        categories.clear()
+
+    def flush_tasks():
+        storage.insert_tasks(tasks)
+        counts['task'] += len(tasks)
+        tasks.clear()
+
+    for kind, doc, created_at in _read_jsonl(path):
+        if kind == 'category':
+            new_id = ObjectId()
+            category_ids[doc['_id']] = new_id
+            categories.append({'_id': new_id, 'name': doc['name'],
+                               'created_at': created_at})
+        else:
+            category_id = category_ids.get(doc['category_id'])
+            if category_id is None:
+                counts['skipped'] += 1
+                continue
+            tasks.append({'_id': ObjectId(),
+                          'category_id': category_id,
+                          'name': doc['name'],
+                          'completed': bool(doc['completed']),
+                          'created_at': created_at})
+
+        # Goals are written before any task that points at them
+        if len(categories) >= batch_size or (tasks and categories):
+            flush_categories()
+        if len(tasks) >= batch_size:
+            flush_tasks()
+    flush_categories()
+    flush_tasks()
+    return counts['category'], counts['task'], counts['skipped']
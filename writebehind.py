@@ -0,0 +1,190 @@
+"""
+Write-behind buffer for the Pokemon Todo List
+Coalesces rapid edits per document and journals them until they are
+flushed to storage in one ordered batch.
+
+The journal is an append-only JSONL file. Every write the UI applies is
+appended to it before the write is acknowledged, and a marker line is
+appended once a batch has reached the database:
+
+    {"seq": 12, "write": ["update_task", [{"$oid": "..."}, {...}]]}
+    {"done": 12}
+
+Writes after the last marker are replayed on the next start, so an edit
+survives the process dying before its flush.
+"""
+import os
+import threading
+
+from storage import WriteRejected, dump_json, load_json
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_JOURNAL_PATH = os.path.join(
+    os.path.expanduser('~'), '.pokemon_todo.journal')
+
+
+def _lock(f):
+    """Take an exclusive lock on an open file, False if another process
+    holds it. The OS releases it when the process dies."""
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class WriteBehind:
+    """Pending storage writes, coalesced per document and journaled
+
+    A write is the name and arguments of a storage write method, e.g.
+    ('update_task', (task_id, {'completed': True})). Writes to the same
+    document collapse: $set fields of updates merge, an unflushed insert
+    absorbs later updates and disappears on delete. Bulk selector writes
+    (update_tasks, delete_tasks) are barriers: nothing queued after one
+    merges into a write queued before it.
+
+    add() runs on the UI thread, flush() on the storage worker.
+    """
+
+    # Start the journal over once it is this big and fully flushed
+    COMPACT_BYTES = 1 << 20
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self.pending = []  # [method, args] entries in write order
+        self._latest = {}  # (noun, _id) -> entry, since the last barrier
+        self._lock = threading.Lock()
+        self.seq = 0
+        self.recovered = 0  # Writes replayed from the journal
+        self.journal = None
+        self._lock_file = None
+        if path:
+            self._open_journal()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def _open_journal(self):
+        self._lock_file = open(self.path + '.lock', 'a')
+        if not _lock(self._lock_file):
+            self._lock_file.close()
+            self._lock_file = None
+            print(f"⚠ {self.path} is in use by another instance, "
+                  f"edits are not journaled")
+            return
+        writes, done, torn = {}, 0, False
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    torn = not line.endswith('\n')
+                    try:
+                        entry = load_json(line)
+                        if 'done' in entry:
+                            done = max(done, entry['done'])
+                        else:
+                            writes[entry['seq']] = entry['write']
+                    except (KeyError, TypeError, ValueError):
+                        continue  # A line cut short by a crash
+        self.seq = max([done, *writes])
+        for seq in sorted(writes):
+            if seq > done:
+                self._coalesce(*writes[seq])
+                self.recovered += 1
+        self.journal = open(self.path, 'a', encoding='utf-8')
+        if torn:
+            # Never append to the end of a line cut short by a crash
+            self.journal.write('\n')
+            self.journal.flush()
+
+    def _append(self, entry):
+        if self.journal:
+            self.journal.write(dump_json(entry) + '\n')
+            self.journal.flush()
+
+    def add(self, method, *args):
+        """Queue a write, journaled before this returns"""
+        with self._lock:
+            self.seq += 1
+            self._append({'seq': self.seq, 'write': [method, args]})
+            self._coalesce(method, args)
+
+    def _coalesce(self, method, args):
+        args = [dict(arg) if isinstance(arg, dict) else arg for arg in args]
+        kind, _, noun = method.partition('_')
+        if noun not in ('category', 'task'):
+            # A bulk write over a selector
+            self.pending.append([method, args])
+            self._latest = {}
+            return
+        key = (noun, args[0]['_id'] if kind == 'insert' else args[0])
+        entry = self._latest.get(key)
+        if entry is not None and kind == 'update':
+            if entry[0].startswith('insert'):
+                entry[1][0].update(args[1])
+                return
+            if entry[0].startswith('update'):
+                entry[1][1].update(args[1])
+                return
+        if entry is not None and kind == 'delete':
+            self.pending.remove(entry)
+            del self._latest[key]
+            if entry[0] == 'insert_task':
+                return  # Never reached the database
+        # A category delete also deletes tasks queued after the insert,
+        # so deletes go to the end instead of replacing the entry
+        entry = [method, args]
+        self.pending.append(entry)
+        self._latest[key] = entry
+
+    def flush(self, apply):
+        """Hand every pending write to apply(writes) as one batch,
+        returns how many were applied
+
+        Writes that fail go back in front of newer ones for the next
+        flush, unless WriteRejected says a retry would fail as well.
+        """
+        with self._lock:
+            entries, seq = self.pending, self.seq
+            self.pending, self._latest = [], {}
+        if not entries:
+            return 0
+        try:
+            apply([(method, tuple(args)) for method, args in entries])
+        except WriteRejected:
+            self._settle(seq)
+            raise
+        except Exception:
+            with self._lock:
+                retry, self.pending, self._latest = (
+                    entries + self.pending, [], {})
+                for method, args in retry:
+                    self._coalesce(method, args)
+            raise
+        self._settle(seq)
+        return len(entries)
+
+    def _settle(self, seq):
+        # Journaled writes up to seq are in the database (or refused)
+        with self._lock:
+            self._append({'done': seq})
+            if (self.journal and not self.pending
+                    and self.journal.tell() > self.COMPACT_BYTES):
+                self.journal.truncate(0)
+                self.journal.seek(0)
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None